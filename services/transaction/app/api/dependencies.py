@@ -0,0 +1,17 @@
+import re
+
+from fastapi import Request
+
+from app.core.errors import InvalidRequestException
+from app.domain.models import DEFAULT_PORTFOLIO_ID
+
+PORTFOLIO_ID_PATTERN = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+def get_portfolio_id(request: Request) -> str:
+    # Routers are mounted both at the root (default portfolio) and under
+    # /portfolios/{portfolio_id}, so the id is optional in the path.
+    portfolio_id = request.path_params.get("portfolio_id", DEFAULT_PORTFOLIO_ID)
+    if not PORTFOLIO_ID_PATTERN.fullmatch(portfolio_id):
+        raise InvalidRequestException(f"Invalid portfolio id: {portfolio_id}")
+    return portfolio_id
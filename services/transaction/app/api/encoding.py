@@ -0,0 +1,54 @@
+"""Fast response path for large read endpoints.
+
+Handlers build plain data (dicts, rows, domain dataclasses) that already has
+the shape of the response model, so it is serialized directly instead of being
+validated again and walked by ``jsonable_encoder``. JSON goes through orjson
+when installed (pydantic-core otherwise); clients sending
+``Accept: application/msgpack`` get MessagePack when the optional ``msgpack``
+dependency is installed (``pip install .[msgpack]``).
+"""
+
+from typing import Any, Mapping
+
+import pydantic_core
+from fastapi import Request, Response
+
+from app.core.timing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def encoded_response(request: Request, content: Any, headers: Mapping[str, str] | None = None) -> Response:
+    """Serialize ``content`` in the format negotiated from the Accept header."""
+    headers = {**(headers or {}), "Vary": "Accept"}
+    media_type = negotiated_media_type(request)
+    with span("serialize"):
+        if media_type == JSON_MEDIA_TYPE:
+            return Response(dumps_json(content), headers=headers, media_type=media_type)
+        body = msgpack.packb(pydantic_core.to_jsonable_python(content))
+        return Response(body, headers=headers, media_type=media_type)
+
+
+def negotiated_media_type(request: Request) -> str:
+    accept = request.headers.get("accept", "")
+    if msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return MSGPACK_MEDIA_TYPES[0]
+    return JSON_MEDIA_TYPE
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        # Native support for dataclasses, dates, UUIDs and str enums.
+        return orjson.dumps(content)
+    return pydantic_core.to_json(content)
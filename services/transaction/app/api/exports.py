@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from app.api.dependencies import get_portfolio_id
+from app.core.database import get_session
+from app.core.errors import InvalidRequestException
+from app.domain.models import Transaction
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+# Same columns accepted by POST /imports/transactions, so exports can be re-imported.
+EXPORT_COLUMNS = (
+    "asset_id",
+    "asset_name",
+    "asset_type",
+    "operation_type",
+    "quantity",
+    "price",
+    "currency",
+    "trade_date",
+    "idempotency_key",
+)
+# Rows fetched per round trip from the server-side cursor.
+EXPORT_BATCH_SIZE = 5000
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+@router.get("/transactions")
+def export_transactions(
+    format: ExportFormat = Query(default=ExportFormat.CSV),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: Session = Depends(get_session),
+):
+    encoders = {
+        ExportFormat.CSV: _csv_chunks,
+        ExportFormat.NDJSON: _ndjson_chunks,
+        ExportFormat.PARQUET: _parquet_chunks,
+    }
+    if format == ExportFormat.PARQUET:
+        _require_pyarrow()
+    # The stream outlives the request-scoped session, so it opens its own on the same engine.
+    chunks = encoders[format](_iter_batches(session.get_bind(), portfolio_id))
+    filename = f"transactions.{format.value}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _iter_batches(bind: Engine, portfolio_id: str) -> Iterator[list[tuple]]:
+    columns = [getattr(Transaction, name) for name in EXPORT_COLUMNS]
+    stmt = (
+        select(*columns)
+        .where(Transaction.portfolio_id == portfolio_id)
+        .order_by(Transaction.trade_date, Transaction.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    operation_index = EXPORT_COLUMNS.index("operation_type")
+    with Session(bind) as session:
+        for partition in session.exec(stmt).partitions():
+            batch = []
+            for row in partition:
+                values = list(row)
+                values[operation_index] = values[operation_index].value
+                batch.append(tuple(values))
+            yield batch
+
+
+def _csv_chunks(batches: Iterator[list[tuple]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            (asset_id, name, asset_type, op, quantity, price, currency, trade_date.isoformat(), key)
+            for asset_id, name, asset_type, op, quantity, price, currency, trade_date, key in batch
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows.
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(batches: Iterator[list[tuple]]) -> Iterator[str]:
+    trade_date_index = EXPORT_COLUMNS.index("trade_date")
+    for batch in batches:
+        lines = []
+        for row in batch:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record["trade_date"] = row[trade_date_index].isoformat()
+            lines.append(json.dumps(record))
+        yield "\n".join(lines) + "\n"
+
+
+def _parquet_chunks(batches: Iterator[list[tuple]]) -> Iterator[bytes]:
+    pa, pq = _require_pyarrow()
+    schema = pa.schema(
+        [
+            ("asset_id", pa.string()),
+            ("asset_name", pa.string()),
+            ("asset_type", pa.string()),
+            ("operation_type", pa.string()),
+            ("quantity", pa.float64()),
+            ("price", pa.float64()),
+            ("currency", pa.string()),
+            ("trade_date", pa.date32()),
+            ("idempotency_key", pa.string()),
+        ]
+    )
+    sink = _ChunkSink()
+    # One row group per DB batch; bytes are handed to the client as soon as each group is written.
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch)) if batch else [[] for _ in EXPORT_COLUMNS]
+            writer.write_table(pa.Table.from_arrays([list(column) for column in columns], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise InvalidRequestException("Parquet export requires the optional 'pyarrow' dependency") from exc
+    return pa, pq
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers bytes until drained."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
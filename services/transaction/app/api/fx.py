@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from sqlmodel import Session
+
+from app.api.imports import IMPORT_BATCH_SIZE
+from app.api.parsing import parse_date, parse_float, required
+from app.api.prices import ingest_upload
+from app.api.schemas import ImportResult
+from app.core.database import get_session
+from app.domain.fx import FX_PIVOT_CURRENCY, FxService
+from app.domain.models import FxRate
+
+router = APIRouter(prefix="/fx-rates", tags=["fx"])
+
+FX_RATE_COLUMNS = {"currency", "date", "rate"}
+
+
+@router.post("/import", response_model=ImportResult)
+def import_fx_rates(
+    file: UploadFile = File(...),
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=10_000),
+    session: Session = Depends(get_session),
+):
+    """Upsert daily rates from a CSV (currency,date,rate) or NDJSON upload; rate = USD per unit."""
+    return ingest_upload(file, FX_RATE_COLUMNS, _row_to_rate, FxService(session).upsert_rates, batch_size)
+
+
+def _row_to_rate(row: dict) -> FxRate:
+    currency = required(row, "currency").upper()
+    if len(currency) != 3:
+        raise ValueError(f"Invalid currency code: {currency}")
+    if currency == FX_PIVOT_CURRENCY:
+        raise ValueError(f"{FX_PIVOT_CURRENCY} is the pivot currency, its rate is always 1")
+    rate = parse_float(required(row, "rate"))
+    if rate <= 0:
+        raise ValueError(f"Rate must be greater than zero: {rate}")
+    return FxRate(currency=currency, rate_date=parse_date(required(row, "date")), rate=rate)
@@ -1,14 +1,30 @@
+import contextlib
 import csv
-import io
-from datetime import date
+import logging
+import os
+import shutil
+import socket
+import threading
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Callable, Iterator
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, File, UploadFile
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Engine, and_, func, or_, update
+from sqlmodel import Session, select
 
-from app.api.schemas import ImportResult, ImportErrorItem
+from app.api.dependencies import get_portfolio_id
+from app.api.parsing import READ_CHUNK_SIZE, iter_text_lines, parse_date, parse_float, required
+from app.api.schemas import ImportErrorItem, ImportJobRead, ImportProgress, ImportResult
+from app.core.config import get_settings
 from app.core.database import get_session
-from app.domain.models import Transaction
-from app.domain.services import TransactionService, DomainException
+from app.core.errors import NotFoundException
+from app.core.jobs import job_runner
+from app.domain.models import ImportJob, ImportJobStatus, Transaction, utcnow
+from app.domain.services import TransactionService
+
+logger = logging.getLogger("transactions_service.imports")
 
 router = APIRouter(prefix="/imports", tags=["imports"])
 
@@ -21,49 +37,343 @@ REQUIRED_COLUMNS = {
     "trade_date",
 }
 
+# Rows validated and inserted per DB transaction.
+IMPORT_BATCH_SIZE = 1000
+# Errors stored per import job (the rest are only counted).
+IMPORT_JOB_MAX_ERRORS = 1000
+
+# Identifies this process in ImportJob.owner for the jobs it claims.
+JOB_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
 
 @router.post("/transactions", response_model=ImportResult)
-async def import_transactions_csv(
+def import_transactions_csv(
+    file: UploadFile = File(...),
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=10_000),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: Session = Depends(get_session),
+):
+    result = ImportResult(inserted=0, skipped=0, errors=[])
+    for progress in _run_import(file.file, TransactionService(session, portfolio_id), batch_size):
+        result.inserted = progress.inserted
+        result.skipped = progress.skipped
+        result.errors.extend(progress.errors)
+    return result
+
+
+@router.post("/transactions/stream")
+def import_transactions_csv_stream(
+    file: UploadFile = File(...),
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=10_000),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: Session = Depends(get_session),
+):
+    # One NDJSON line per committed batch, the last one has done=true. The
+    # stream outlives the request-scoped session, so it opens its own, like the exports.
+    return StreamingResponse(
+        _stream_import(file.file, session.get_bind(), portfolio_id, batch_size), media_type="application/x-ndjson"
+    )
+
+
+def _stream_import(binary_file: BinaryIO, bind: Engine, portfolio_id: str, batch_size: int) -> Iterator[str]:
+    with Session(bind) as session:
+        for progress in _run_import(binary_file, TransactionService(session, portfolio_id), batch_size):
+            yield progress.model_dump_json() + "\n"
+
+
+@router.post("/jobs", response_model=ImportJobRead, status_code=202)
+def create_import_job(
     file: UploadFile = File(...),
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=10_000),
+    portfolio_id: str = Depends(get_portfolio_id),
     session: Session = Depends(get_session),
 ):
-    content = await file.read()
-    text = content.decode("utf-8-sig")
-    reader = csv.DictReader(io.StringIO(text))
+    jobs_dir = get_settings().import_jobs_dir
+    if jobs_dir is None:
+        # A temporary directory would lose the uploads of pending jobs on every container recreate.
+        raise HTTPException(
+            status_code=503, detail="Import jobs are disabled: set IMPORT_JOBS_DIR to a persistent directory"
+        )
+    job = ImportJob(portfolio_id=portfolio_id, file_name=file.filename, file_path="", batch_size=batch_size)
+    os.makedirs(jobs_dir, exist_ok=True)
+    job.file_path = os.path.join(jobs_dir, f"{job.id}.csv")
+    with open(job.file_path, "wb") as target:
+        shutil.copyfileobj(file.file, target, READ_CHUNK_SIZE)
+
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    job_runner.submit(process_import_job, job.id, session.get_bind())
+    return _job_read(job)
+
+
+@router.get("/jobs/{job_id}", response_model=ImportJobRead)
+def get_import_job(
+    job_id: UUID,
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: Session = Depends(get_session),
+):
+    job = session.get(ImportJob, job_id)
+    if job is None or job.portfolio_id != portfolio_id:
+        raise NotFoundException(f"Import job {job_id} not found")
+    return _job_read(job)
+
+
+def process_import_job(job_id: UUID, bind: Engine) -> None:
+    with Session(bind) as session:
+        # Several workers or replicas may queue the same job: the conditional
+        # UPDATE lets exactly one of them run it.
+        if not _claim_import_job(session, job_id):
+            return
+        job = session.get(ImportJob, job_id)
+        file_path = job.file_path
+        service = TransactionService(session, job.portfolio_id)
+        errors = list(job.errors)
+        error_count = job.error_count
+
+        def on_batch(progress: ImportProgress) -> None:
+            nonlocal errors, error_count
+            now = utcnow()
+            error_count += len(progress.errors)
+            values = {
+                "rows_processed": progress.rows_processed,
+                "inserted": progress.inserted,
+                "skipped": progress.skipped,
+                "error_count": error_count,
+                "updated_at": now,
+            }
+            # The JSON list is rewritten only while it grows, so it can't make a job quadratic.
+            if progress.errors and len(errors) < IMPORT_JOB_MAX_ERRORS:
+                errors = [*errors, *(error.model_dump() for error in progress.errors)][:IMPORT_JOB_MAX_ERRORS]
+                values["errors"] = errors
+            if progress.done:
+                values.update(status=ImportJobStatus.COMPLETED, finished_at=now)
+            # Committed with the batch, so the batch is rolled back if the job was taken over meanwhile.
+            if not _update_owned_job(session, job_id, **values):
+                raise ImportJobLost(f"Import job {job_id} was taken over by another worker")
+
+        resume_from = ImportProgress(
+            rows_processed=job.rows_processed,
+            inserted=job.inserted,
+            skipped=job.skipped,
+            errors=[],
+            done=False,
+        )
+        # The upload is kept until the job is COMPLETED or FAILED, so an interrupted job can resume.
+        terminal = False
+        try:
+            with open(file_path, "rb") as binary_file:
+                for _ in _run_import(binary_file, service, job.batch_size, resume_from, on_batch):
+                    pass
+            terminal = True
+        except ImportJobLost:
+            session.rollback()
+            logger.warning("import_job_lost", extra={"job_id": str(job_id)})
+        except Exception as exc:
+            session.rollback()
+            logger.exception("import_job_failed", extra={"job_id": str(job_id)})
+            now = utcnow()
+            terminal = _update_owned_job(
+                session, job_id, status=ImportJobStatus.FAILED, message=str(exc), finished_at=now, updated_at=now
+            )
+            session.commit()
+        finally:
+            if terminal:
+                # Already gone when the failure was the missing upload itself.
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(file_path)
+
+
+class ImportJobLost(Exception):
+    """Raised when another worker took over a job whose lease expired."""
+
+
+def _claimable(now: datetime):
+    # PENDING, or RUNNING without a committed batch for a whole lease (its worker died).
+    lease = timedelta(seconds=get_settings().import_job_lease_seconds)
+    return or_(
+        ImportJob.status == ImportJobStatus.PENDING,
+        and_(ImportJob.status == ImportJobStatus.RUNNING, ImportJob.updated_at < now - lease),
+    )
+
+
+def _claim_import_job(session: Session, job_id: UUID) -> bool:
+    now = utcnow()
+    claimed = session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, _claimable(now))
+        .values(
+            status=ImportJobStatus.RUNNING,
+            owner=JOB_OWNER,
+            started_at=func.coalesce(ImportJob.started_at, now),
+            updated_at=now,
+        )
+    ).rowcount
+    session.commit()
+    return claimed == 1
+
+
+def _update_owned_job(session: Session, job_id: UUID, **values) -> bool:
+    # Also renews the lease. Not committed: the caller commits it with its batch.
+    updated = session.execute(
+        update(ImportJob).where(ImportJob.id == job_id, ImportJob.owner == JOB_OWNER).values(**values)
+    ).rowcount
+    return updated == 1
+
+
+def resume_import_jobs(bind: Engine) -> int:
+    # Queues the jobs that are PENDING or left RUNNING by a dead worker; they
+    # continue from their last committed batch. The claim decides who runs them.
+    with Session(bind) as session:
+        job_ids = session.exec(select(ImportJob.id).where(_claimable(utcnow()))).all()
+    for job_id in job_ids:
+        job_runner.submit(process_import_job, job_id, bind)
+    return len(job_ids)
+
+
+class ImportJobResumer:
+    """Background thread running `resume_import_jobs` at start and then once per lease."""
+
+    def __init__(self, bind: Engine, interval: float) -> None:
+        self.bind = bind
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="import-job-resumer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                resume_import_jobs(self.bind)
+            except Exception:
+                logger.exception("import_job_resume_failed")
+            self._stopped.wait(self.interval)
+
+
+def _job_read(job: ImportJob) -> ImportJobRead:
+    rows_per_second = 0.0
+    if job.started_at is not None:
+        elapsed = ((job.finished_at or job.updated_at) - job.started_at).total_seconds()
+        rows_per_second = round(job.rows_processed / elapsed, 2) if elapsed > 0 else 0.0
+    return ImportJobRead(
+        id=job.id,
+        portfolio_id=job.portfolio_id,
+        status=job.status.value,
+        file_name=job.file_name,
+        rows_processed=job.rows_processed,
+        inserted=job.inserted,
+        skipped=job.skipped,
+        rows_per_second=rows_per_second,
+        errors=[ImportErrorItem(**error) for error in job.errors],
+        error_count=job.error_count,
+        message=job.message,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _run_import(
+    binary_file: BinaryIO,
+    service: TransactionService,
+    batch_size: int,
+    resume_from: ImportProgress | None = None,
+    on_batch: Callable[[ImportProgress], None] | None = None,
+) -> Iterator[ImportProgress]:
+    """Import CSV rows in batches, yielding the progress after each commit.
+
+    ``on_batch`` runs before each commit, so anything it stages in the session
+    (e.g. job progress) is committed atomically with the batch. ``resume_from``
+    skips the rows already accounted for by a previous run.
+    """
+    reader = csv.DictReader(iter_text_lines(binary_file))
 
     if not reader.fieldnames:
-        return ImportResult(inserted=0, skipped=0, errors=[ImportErrorItem(row_number=1, message="Missing header")])
+        yield _finish(_header_error("Missing header"), service, on_batch)
+        return
 
     missing = REQUIRED_COLUMNS.difference(set(reader.fieldnames))
     if missing:
-        message = f"Missing columns: {', '.join(sorted(missing))}"
-        return ImportResult(inserted=0, skipped=0, errors=[ImportErrorItem(row_number=1, message=message)])
+        yield _finish(_header_error(f"Missing columns: {', '.join(sorted(missing))}"), service, on_batch)
+        return
+
+    progress = ImportProgress(rows_processed=0, inserted=0, skipped=0, errors=[], done=False)
+    if resume_from is not None:
+        progress = resume_from.model_copy(update={"errors": [], "done": False})
+    already_processed = progress.rows_processed
+    batch: list[tuple[int, Transaction, str | None]] = []
 
-    service = TransactionService(session)
-    inserted = 0
-    skipped = 0
-    errors: list[ImportErrorItem] = []
+    def flush_batch(done: bool = False) -> ImportProgress:
+        results = service.create_transactions([(tx, key) for _, tx, key in batch], commit=False)
+        for (row_number, _, _), result in zip(batch, results):
+            if result.status == "rejected":
+                progress.errors.append(ImportErrorItem(row_number=row_number, message=result.message))
+                progress.skipped += 1
+            else:
+                # Rows matching an existing Idempotency-Key count as inserted, like single creates.
+                progress.inserted += 1
+        batch.clear()
+        progress.errors.sort(key=lambda item: item.row_number)
+        flushed = progress.model_copy(update={"errors": list(progress.errors), "done": done})
+        progress.errors.clear()
+        return _finish(flushed, service, on_batch)
 
     for row_number, row in enumerate(reader, start=2):
+        if row_number - 1 <= already_processed:
+            continue
+        # Flush lazily so the last batch is reported by the final (done) line.
+        if len(batch) >= batch_size:
+            yield flush_batch()
+        progress.rows_processed += 1
         try:
             transaction = _row_to_transaction(row)
-            idempotency_key = row.get("idempotency_key") or None
-            service.create_transaction(transaction, idempotency_key=idempotency_key)
-            inserted += 1
-        except (ValueError, DomainException) as exc:
-            errors.append(ImportErrorItem(row_number=row_number, message=str(exc)))
-            skipped += 1
+        except ValueError as exc:
+            progress.errors.append(ImportErrorItem(row_number=row_number, message=str(exc)))
+            progress.skipped += 1
+            continue
+        batch.append((row_number, transaction, row.get("idempotency_key") or None))
 
-    return ImportResult(inserted=inserted, skipped=skipped, errors=errors)
+    yield flush_batch(done=True)
+
+
+def _finish(
+    progress: ImportProgress,
+    service: TransactionService,
+    on_batch: Callable[[ImportProgress], None] | None,
+) -> ImportProgress:
+    if on_batch is not None:
+        on_batch(progress)
+    service.commit()
+    return progress
+
+
+def _header_error(message: str) -> ImportProgress:
+    return ImportProgress(
+        rows_processed=0,
+        inserted=0,
+        skipped=0,
+        errors=[ImportErrorItem(row_number=1, message=message)],
+        done=True,
+    )
 
 
 def _row_to_transaction(row: dict) -> Transaction:
-    asset_id = _required(row, "asset_id")
-    operation_type = _required(row, "operation_type").upper()
-    quantity = _parse_float(_required(row, "quantity"))
-    price = _parse_float(_required(row, "price"))
-    currency = _required(row, "currency").upper()
-    trade_date = _parse_date(_required(row, "trade_date"))
+    asset_id = required(row, "asset_id")
+    operation_type = required(row, "operation_type").upper()
+    quantity = parse_float(required(row, "quantity"))
+    price = parse_float(required(row, "price"))
+    currency = required(row, "currency").upper()
+    trade_date = parse_date(required(row, "trade_date"))
 
     asset_name = row.get("asset_name") or None
     asset_type = row.get("asset_type") or None
@@ -78,24 +388,3 @@ def _row_to_transaction(row: dict) -> Transaction:
         currency=currency,
         trade_date=trade_date,
     )
-
-
-def _required(row: dict, key: str) -> str:
-    value = row.get(key)
-    if value is None or str(value).strip() == "":
-        raise ValueError(f"Missing value for {key}")
-    return str(value).strip()
-
-
-def _parse_float(value: str) -> float:
-    try:
-        return float(value)
-    except ValueError as exc:
-        raise ValueError(f"Invalid number: {value}") from exc
-
-
-def _parse_date(value: str) -> date:
-    try:
-        return date.fromisoformat(value)
-    except ValueError as exc:
-        raise ValueError(f"Invalid date: {value}") from exc
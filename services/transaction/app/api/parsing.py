@@ -0,0 +1,53 @@
+"""Field parsing shared by the CSV/NDJSON uploads (transactions, prices, FX rates).
+
+Errors are raised as ValueError with a message meant for the per-row error report.
+"""
+
+import codecs
+import math
+from datetime import date
+from typing import BinaryIO, Iterator
+
+# Bytes read from an upload at a time.
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_text_lines(binary_file: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    # Decode the upload chunk by chunk so only one chunk (plus a partial line)
+    # is held in memory. Splitting only on "\n" keeps quoted newlines intact for csv.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while chunk := binary_file.read(chunk_size):
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def required(row: dict, key: str) -> str:
+    value = row.get(key)
+    if value is None or str(value).strip() == "":
+        raise ValueError(f"Missing value for {key}")
+    return str(value).strip()
+
+
+def parse_float(value: str) -> float:
+    # float() accepts "nan" and "inf", which pass every `<= 0` check and then
+    # poison each sum they enter.
+    try:
+        number = float(value)
+    except ValueError as exc:
+        raise ValueError(f"Invalid number: {value}") from exc
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid number: {value}")
+    return number
+
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError as exc:
+        raise ValueError(f"Invalid date: {value}") from exc
@@ -1,47 +1,252 @@
-from fastapi import APIRouter, Depends
+import base64
+import json
+import re
+from dataclasses import asdict
+from datetime import date
+from typing import Iterator
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Engine, func
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.dependencies import get_portfolio_id
+from app.api.encoding import encoded_response, negotiated_media_type
 from app.api.schemas import (
     PortfolioAllocation,
+    PortfolioHistoryPoint,
     PortfolioMetrics,
     PortfolioSnapshot,
-    HoldingRead,
-    AllocationBucket,
+    ClosedLotRead,
+    LotPositionRead,
+    RealizedPnL,
 )
-from app.core.database import get_session
-from app.domain.models import Transaction
-from app.domain.portfolio import build_portfolio_snapshot
+from app.core.config import get_settings
+from app.core.database import get_async_session, get_session
+from app.core.errors import InvalidRequestException
+from app.domain import portfolio as domain
+from app.domain.engines import EngineUnavailable, PortfolioEngine, compute_snapshot
+from app.domain.fx import FxRateUnavailable
+from app.domain.history import HistoryInterval, iter_history
+from app.domain.ledger import select_ledger
+from app.domain.lots import ClosedLotWindow, CostMethod, RealizedReport, match_lots
+from app.domain.models import Price, Transaction
+from app.domain.snapshot_cache import snapshot_cache
+
+# Mounted at /portfolio (default portfolio) and /portfolios/{portfolio_id} in main.py.
+router = APIRouter(tags=["portfolio"])
+
+# Rows fetched per round trip while sweeping the log for /portfolio/history.
+HISTORY_BATCH_SIZE = 5000
+
+# One entity-tag of an If-None-Match list: optional weak prefix, quoted opaque tag (commas allowed inside).
+ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")')
+
+
+async def load_snapshot(
+    request: Request,
+    response: Response,
+    engine: PortfolioEngine | None = Query(default=None, description="Defaults to the PORTFOLIO_ENGINE setting"),
+    base_currency: str | None = Query(
+        default=None, min_length=3, max_length=3, description="Convert all amounts to this currency"
+    ),
+    if_none_match: str | None = Header(default=None),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: AsyncSession = Depends(get_async_session),
+) -> domain.PortfolioSnapshot:
+    engine = engine or PortfolioEngine(get_settings().portfolio_engine)
+    base_currency = base_currency.upper() if base_currency else None
+    cache_key = (portfolio_id, engine, base_currency)
+    version = snapshot_cache.version()
+    # JSON and MessagePack bodies are different representations, so they get different tags.
+    etag = snapshot_cache.etag((*cache_key, negotiated_media_type(request)), version)
+    if _none_match(if_none_match, etag):
+        # Unchanged since the client's copy: answer before touching the database.
+        raise HTTPException(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    response.headers["ETag"] = etag
+
+    snapshot = snapshot_cache.get(cache_key, version)
+    if snapshot is None:
+        try:
+            snapshot = await session.run_sync(compute_snapshot, engine, base_currency, portfolio_id)
+        except (EngineUnavailable, FxRateUnavailable) as exc:
+            raise InvalidRequestException(str(exc)) from exc
+        snapshot_cache.put(cache_key, version, snapshot)
+    return snapshot
+
 
-router = APIRouter(prefix="/portfolio", tags=["portfolio"])
+def _none_match(if_none_match: str | None, etag: str) -> bool:
+    # RFC 9110 13.1.2: "*" or a comma-separated list of entity-tags, compared weakly (W/ ignored).
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in ENTITY_TAG.findall(if_none_match)
 
 
+# The snapshot dataclasses have the fields of the response models (HoldingRead,
+# PortfolioMetrics, AllocationBucket) and are serialized without re-validation.
 @router.get("", response_model=PortfolioSnapshot)
 @router.get("/", response_model=PortfolioSnapshot, include_in_schema=False)
-def get_portfolio(session: Session = Depends(get_session)):
-    transactions = session.exec(select(Transaction)).all()
-    snapshot = build_portfolio_snapshot(transactions)
-    return PortfolioSnapshot(
-        holdings=[HoldingRead(**h.__dict__) for h in snapshot.holdings],
-        metrics=PortfolioMetrics(**snapshot.metrics.__dict__),
-        allocation=PortfolioAllocation(
-            by_asset_type=[AllocationBucket(**b.__dict__) for b in snapshot.allocation_by_asset_type],
-            by_currency=[AllocationBucket(**b.__dict__) for b in snapshot.allocation_by_currency],
-        ),
-    )
+async def get_portfolio(
+    request: Request, response: Response, snapshot: domain.PortfolioSnapshot = Depends(load_snapshot)
+):
+    content = {
+        "holdings": snapshot.holdings,
+        "metrics": snapshot.metrics,
+        "allocation": _allocation(snapshot),
+    }
+    return encoded_response(request, content, response.headers)
 
 
 @router.get("/metrics", response_model=PortfolioMetrics)
-def get_portfolio_metrics(session: Session = Depends(get_session)):
-    transactions = session.exec(select(Transaction)).all()
-    snapshot = build_portfolio_snapshot(transactions)
-    return PortfolioMetrics(**snapshot.metrics.__dict__)
+async def get_portfolio_metrics(
+    request: Request, response: Response, snapshot: domain.PortfolioSnapshot = Depends(load_snapshot)
+):
+    return encoded_response(request, snapshot.metrics, response.headers)
 
 
 @router.get("/allocation", response_model=PortfolioAllocation)
-def get_portfolio_allocation(session: Session = Depends(get_session)):
-    transactions = session.exec(select(Transaction)).all()
-    snapshot = build_portfolio_snapshot(transactions)
-    return PortfolioAllocation(
-        by_asset_type=[AllocationBucket(**b.__dict__) for b in snapshot.allocation_by_asset_type],
-        by_currency=[AllocationBucket(**b.__dict__) for b in snapshot.allocation_by_currency],
+async def get_portfolio_allocation(
+    request: Request, response: Response, snapshot: domain.PortfolioSnapshot = Depends(load_snapshot)
+):
+    return encoded_response(request, _allocation(snapshot), response.headers)
+
+
+def _allocation(snapshot: domain.PortfolioSnapshot) -> dict:
+    return {"by_asset_type": snapshot.allocation_by_asset_type, "by_currency": snapshot.allocation_by_currency}
+
+
+@router.get(
+    "/history",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "NDJSON stream, one PortfolioHistoryPoint per line",
+            "content": {"application/x-ndjson": {"schema": PortfolioHistoryPoint.model_json_schema()}},
+        }
+    },
+)
+def get_portfolio_history(
+    start: date | None = Query(default=None, alias="from", description="Defaults to the first trade date"),
+    end: date | None = Query(default=None, alias="to", description="Defaults to today"),
+    interval: HistoryInterval = Query(default=HistoryInterval.DAILY),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: Session = Depends(get_session),
+):
+    end = end or date.today()
+    first_trade_date = session.exec(
+        select(func.min(Transaction.trade_date)).where(Transaction.portfolio_id == portfolio_id)
+    ).one()
+    start = start or first_trade_date or end
+    if start > end:
+        raise InvalidRequestException("'from' must not be after 'to'")
+    # One NDJSON line per point; the streams open their own sessions, like the exports.
+    bind = session.get_bind()
+    points = iter_history(
+        _iter_log(bind, portfolio_id, end), start, end, interval, marks=_iter_marks(bind, portfolio_id, end)
+    )
+    lines = (
+        PortfolioHistoryPoint(date=point_date, **metrics.__dict__).model_dump_json() + "\n"
+        for point_date, metrics in points
     )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+def _iter_log(bind: Engine, portfolio_id: str, end: date) -> Iterator:
+    stmt = (
+        select_ledger(portfolio_id)
+        .where(Transaction.trade_date <= end)
+        .execution_options(yield_per=HISTORY_BATCH_SIZE)
+    )
+    with Session(bind) as session:
+        yield from session.exec(stmt)
+
+
+def _iter_marks(bind: Engine, portfolio_id: str, end: date) -> Iterator:
+    # Closes of the assets this portfolio ever traded, oldest first.
+    traded = select(Transaction.asset_id).where(Transaction.portfolio_id == portfolio_id).distinct()
+    stmt = (
+        select(Price.asset_id, Price.currency, Price.price_date, Price.close)
+        .where(Price.asset_id.in_(traded), Price.price_date <= end)
+        .order_by(Price.price_date)
+        .execution_options(yield_per=HISTORY_BATCH_SIZE)
+    )
+    with Session(bind) as session:
+        yield from session.exec(stmt)
+
+
+@router.get("/realized", response_model=RealizedPnL)
+async def get_realized_pnl(
+    response: Response,
+    method: CostMethod = Query(default=CostMethod.FIFO),
+    asset_id: str | None = None,
+    lots: bool = Query(default=False, description="Include the closed lots (paged) next to the per-position summary"),
+    date_from: date | None = Query(default=None, description="Closed lots closed on or after this date"),
+    date_to: date | None = Query(default=None, description="Closed lots closed on or before this date"),
+    cursor: str | None = Query(default=None, description="Opaque cursor from the X-Next-Cursor header"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    # The whole log is replayed either way; only the requested page of closed lots is kept.
+    offset = _decode_lot_cursor(cursor) if cursor else 0
+    window = ClosedLotWindow(start=date_from, end=date_to, offset=offset, limit=limit if lots else 0)
+    report = await session.run_sync(_realized_report, method, portfolio_id, asset_id, window)
+    if lots and report.has_more_closed_lots:
+        response.headers["X-Next-Cursor"] = _encode_lot_cursor(offset + limit)
+    positions = []
+    for position in report.positions:
+        quantity = position.quantity
+        cost_basis = position.cost_basis
+        positions.append(
+            LotPositionRead(
+                asset_id=position.asset_id,
+                currency=position.currency,
+                open_quantity=round(quantity, 6),
+                cost_basis=round(cost_basis, 2),
+                average_cost=round(cost_basis / quantity, 4) if quantity else 0.0,
+                realized_pl=round(position.realized_pl, 2),
+            )
+        )
+    return RealizedPnL(
+        method=report.method.value,
+        total_realized_pl=round(report.total_realized_pl, 2),
+        positions=positions,
+        closed_lots=[
+            ClosedLotRead(
+                **{
+                    **asdict(lot),
+                    "quantity": round(lot.quantity, 6),
+                    "realized_pl": round(lot.realized_pl, 2),
+                }
+            )
+            for lot in report.closed_lots
+        ]
+        if lots
+        else None,
+    )
+
+
+def _realized_report(
+    session: Session, method: CostMethod, portfolio_id: str, asset_id: str | None, window: ClosedLotWindow
+) -> RealizedReport:
+    stmt = select_ledger(portfolio_id)
+    if asset_id is not None:
+        stmt = stmt.where(Transaction.asset_id == asset_id)
+    return match_lots(session.exec(stmt), method, window)
+
+
+def _encode_lot_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def _decode_lot_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidRequestException("Invalid cursor") from exc
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidRequestException("Invalid cursor")
+    return offset
@@ -0,0 +1,92 @@
+import csv
+import json
+from typing import Any, BinaryIO, Callable, Iterator, TypeVar
+
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from sqlmodel import Session
+
+from app.api.imports import IMPORT_BATCH_SIZE
+from app.api.parsing import iter_text_lines, parse_date, parse_float, required
+from app.api.schemas import ImportErrorItem, ImportResult
+from app.core.database import get_session
+from app.domain.models import Price
+from app.domain.prices import PriceService
+
+router = APIRouter(prefix="/prices", tags=["prices"])
+
+PRICE_COLUMNS = {"asset_id", "currency", "date", "close"}
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/jsonl", "application/json"}
+
+T = TypeVar("T")
+
+
+@router.post("/import", response_model=ImportResult)
+def import_prices(
+    file: UploadFile = File(...),
+    batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=10_000),
+    session: Session = Depends(get_session),
+):
+    """Upsert daily closes from a CSV (asset_id,currency,date,close) or NDJSON upload."""
+    return ingest_upload(file, PRICE_COLUMNS, _row_to_price, PriceService(session).upsert_prices, batch_size)
+
+
+def ingest_upload(
+    file: UploadFile,
+    columns: set[str],
+    parse_row: Callable[[Any], T],
+    write_batch: Callable[[list[T]], int],
+    batch_size: int,
+) -> ImportResult:
+    """Parse a CSV or NDJSON upload row by row and write it in batches (market data loads)."""
+    result = ImportResult(inserted=0, skipped=0, errors=[])
+    if file.content_type in NDJSON_MEDIA_TYPES or (file.filename or "").endswith((".ndjson", ".jsonl")):
+        rows = _iter_ndjson_rows(file.file)
+    else:
+        reader = csv.DictReader(iter_text_lines(file.file))
+        missing = columns.difference(reader.fieldnames or ())
+        if missing:
+            message = f"Missing columns: {', '.join(sorted(missing))}"
+            result.errors.append(ImportErrorItem(row_number=1, message=message))
+            return result
+        rows = enumerate(reader, start=2)
+
+    batch: list[T] = []
+    for row_number, row in rows:
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Invalid JSON object")
+            batch.append(parse_row(row))
+        except ValueError as exc:
+            result.errors.append(ImportErrorItem(row_number=row_number, message=str(exc)))
+            result.skipped += 1
+            continue
+        if len(batch) >= batch_size:
+            result.inserted += write_batch(batch)
+            batch.clear()
+    result.inserted += write_batch(batch)
+    return result
+
+
+def _iter_ndjson_rows(binary_file: BinaryIO) -> Iterator[tuple[int, Any]]:
+    for row_number, line in enumerate(iter_text_lines(binary_file), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except ValueError:
+            yield row_number, None
+
+
+def _row_to_price(row: dict) -> Price:
+    currency = required(row, "currency").upper()
+    if len(currency) != 3:
+        raise ValueError(f"Invalid currency code: {currency}")
+    close = parse_float(required(row, "close"))
+    if close <= 0:
+        raise ValueError(f"Close must be greater than zero: {close}")
+    return Price(
+        asset_id=required(row, "asset_id"),
+        currency=currency,
+        price_date=parse_date(required(row, "date")),
+        close=close,
+    )
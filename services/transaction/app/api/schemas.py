@@ -1,4 +1,6 @@
-from datetime import date
+from datetime import date, datetime
+from typing import Literal
+
 from pydantic import BaseModel, Field
 from uuid import UUID
 
@@ -14,8 +16,20 @@ class TransactionCreate(BaseModel):
     trade_date: date
 
 
+class TransactionBatchItem(TransactionCreate):
+    idempotency_key: str | None = Field(default=None, description="Same semantics as the Idempotency-Key header")
+
+
+class TransactionBatchCreate(BaseModel):
+    mode: Literal["atomic", "partial"] = Field(
+        default="atomic", description="atomic: all items or none; partial: insert the valid items"
+    )
+    items: list[TransactionBatchItem] = Field(..., min_length=1)
+
+
 class TransactionRead(BaseModel):
     id: UUID
+    portfolio_id: str
     asset_id: str
     asset_name: str | None = None
     asset_type: str | None = None
@@ -26,6 +40,21 @@ class TransactionRead(BaseModel):
     trade_date: date
 
 
+class TransactionBatchItemResult(BaseModel):
+    index: int
+    status: str  # created, duplicate, rejected or aborted
+    transaction: TransactionRead | None = None
+    message: str | None = None
+
+
+class TransactionBatchResult(BaseModel):
+    mode: str
+    created: int
+    duplicates: int
+    rejected: int
+    items: list[TransactionBatchItemResult]
+
+
 class ImportErrorItem(BaseModel):
     row_number: int
     message: str
@@ -37,17 +66,46 @@ class ImportResult(BaseModel):
     errors: list[ImportErrorItem]
 
 
+class ImportProgress(BaseModel):
+    rows_processed: int
+    inserted: int
+    skipped: int
+    errors: list[ImportErrorItem]
+    done: bool
+
+
+class ImportJobRead(BaseModel):
+    id: UUID
+    portfolio_id: str
+    status: str
+    file_name: str | None = None
+    rows_processed: int
+    inserted: int
+    skipped: int
+    rows_per_second: float
+    # The first errors of the job; error_count is the total.
+    errors: list[ImportErrorItem]
+    error_count: int
+    message: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
 class HoldingRead(BaseModel):
     asset_id: str
     asset_name: str
     asset_type: str
     currency: str
     quantity: float
-    average_cost: float
+    average_cost: float = Field(..., description="invested / quantity (net cash flow, not a lot cost basis)")
     last_price: float
-    invested: float
+    invested: float = Field(
+        ...,
+        description="Net cash flow: BUY amounts minus SELL proceeds. Cost basis per lot method: /portfolio/realized",
+    )
     market_value: float
-    unrealized_pl: float
+    unrealized_pl: float = Field(..., description="market_value - invested")
     unrealized_pl_pct: float
 
 
@@ -70,7 +128,39 @@ class PortfolioMetrics(BaseModel):
     total_unrealized_pl_pct: float
 
 
+class PortfolioHistoryPoint(PortfolioMetrics):
+    date: date
+
+
 class PortfolioSnapshot(BaseModel):
     holdings: list[HoldingRead]
     metrics: PortfolioMetrics
     allocation: PortfolioAllocation
+
+
+class LotPositionRead(BaseModel):
+    asset_id: str
+    currency: str
+    open_quantity: float
+    cost_basis: float
+    average_cost: float
+    realized_pl: float
+
+
+class ClosedLotRead(BaseModel):
+    asset_id: str
+    currency: str
+    quantity: float
+    open_date: date
+    close_date: date
+    cost_price: float
+    close_price: float
+    realized_pl: float
+
+
+class RealizedPnL(BaseModel):
+    method: str
+    total_realized_pl: float
+    positions: list[LotPositionRead]
+    # Only with ?lots=true, one page at a time (X-Next-Cursor).
+    closed_lots: list[ClosedLotRead] | None = None
@@ -1,48 +1,158 @@
+import base64
+import json
+from datetime import date
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Response, Header
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Request, Response, Header, Query
+from sqlalchemy import tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.errors import NotFoundException
-from app.api.schemas import TransactionCreate, TransactionRead
-from app.core.database import get_session
-from app.domain.models import Transaction
-from app.domain.services import TransactionService, DomainException
+from app.core.errors import InvalidRequestException, NotFoundException
+from app.api.dependencies import get_portfolio_id
+from app.api.encoding import encoded_response
+from app.api.schemas import (
+    TransactionBatchCreate,
+    TransactionBatchItemResult,
+    TransactionBatchResult,
+    TransactionCreate,
+    TransactionRead,
+)
+from app.core.config import get_settings
+from app.core.database import get_async_session
+from app.core.timing import add_rows, span
+from app.domain.models import OperationType, Transaction
+from app.domain.services import AsyncTransactionService, DomainException
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+READ_COLUMNS = tuple(getattr(Transaction, field) for field in TransactionRead.model_fields)
+
 
 @router.post("", response_model=TransactionRead)
 @router.post("/", response_model=TransactionRead, include_in_schema=False)
-def create_transaction(
+async def create_transaction(
     transaction_in: TransactionCreate,
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
-    session: Session = Depends(get_session),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    service = TransactionService(session)
+    service = AsyncTransactionService(session, portfolio_id)
     transaction = Transaction(**transaction_in.model_dump())
-    return service.create_transaction(transaction, idempotency_key=idempotency_key)
+    return await service.create_transaction(transaction, idempotency_key=idempotency_key)
+
+
+@router.post("/batch", response_model=TransactionBatchResult)
+async def create_transactions_batch(
+    batch: TransactionBatchCreate,
+    response: Response,
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: AsyncSession = Depends(get_async_session),
+):
+    max_items = get_settings().transaction_batch_max_items
+    if len(batch.items) > max_items:
+        raise InvalidRequestException(f"A batch accepts at most {max_items} transactions")
+
+    service = AsyncTransactionService(session, portfolio_id)
+    items = [
+        (Transaction(**item.model_dump(exclude={"idempotency_key"})), item.idempotency_key)
+        for item in batch.items
+    ]
+    results = await service.create_transactions(items, atomic=batch.mode == "atomic")
+    statuses = [result.status for result in results]
+    if batch.mode == "atomic" and "rejected" in statuses:
+        # Nothing was written; the body still says which items failed and why.
+        response.status_code = 400
+    return TransactionBatchResult(
+        mode=batch.mode,
+        created=statuses.count("created"),
+        duplicates=statuses.count("duplicate"),
+        rejected=statuses.count("rejected"),
+        items=[
+            TransactionBatchItemResult(
+                index=index,
+                status=result.status,
+                transaction=TransactionRead.model_validate(result.transaction, from_attributes=True)
+                if result.transaction is not None
+                else None,
+                message=result.message,
+            )
+            for index, result in enumerate(results)
+        ],
+    )
 
 
 @router.get("", response_model=list[TransactionRead])
 @router.get("/", response_model=list[TransactionRead], include_in_schema=False)
-def list_transactions(
-    skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
+async def list_transactions(
+    request: Request,
+    cursor: str | None = Query(default=None, description="Opaque cursor from the X-Next-Cursor header"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    skip: int = Query(default=0, ge=0, deprecated=True, description="Offset paging, use cursor instead"),
+    asset_id: str | None = None,
+    currency: str | None = None,
+    operation_type: OperationType | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    stmt = select(Transaction).offset(skip).limit(limit)
-    return session.exec(stmt).all()
+    # Newest first, (trade_date, id) is a total order so pages are stable.
+    # Only the TransactionRead columns, returned as rows and serialized as they are.
+    stmt = (
+        select(*READ_COLUMNS)
+        .where(Transaction.portfolio_id == portfolio_id)
+        .order_by(Transaction.trade_date.desc(), Transaction.id.desc())
+    )
+    if asset_id:
+        stmt = stmt.where(Transaction.asset_id == asset_id)
+    if currency:
+        stmt = stmt.where(Transaction.currency == currency.upper())
+    if operation_type:
+        stmt = stmt.where(Transaction.operation_type == operation_type)
+    if date_from:
+        stmt = stmt.where(Transaction.trade_date >= date_from)
+    if date_to:
+        stmt = stmt.where(Transaction.trade_date <= date_to)
+    if cursor:
+        stmt = stmt.where(tuple_(Transaction.trade_date, Transaction.id) < _decode_cursor(cursor))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    # Fetch one extra row to know whether another page exists.
+    with span("hydrate"):
+        rows = (await session.exec(stmt.limit(limit + 1))).all()
+        add_rows(len(rows))
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+        content = [row._asdict() for row in rows]
+    return encoded_response(request, content, headers)
 
 
 @router.delete("/{transaction_id}", status_code=204)
-def delete_transaction(
+async def delete_transaction(
     transaction_id: UUID,
-    session: Session = Depends(get_session),
+    portfolio_id: str = Depends(get_portfolio_id),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    service = TransactionService(session)
+    service = AsyncTransactionService(session, portfolio_id)
     try:
-        service.delete_transaction(str(transaction_id))
+        await service.delete_transaction(str(transaction_id))
     except DomainException as exc:
         raise NotFoundException(str(exc))
     return Response(status_code=204)
+
+
+def _encode_cursor(transaction) -> str:
+    raw = json.dumps([transaction.trade_date.isoformat(), str(transaction.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[date, UUID]:
+    try:
+        trade_date, tx_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(trade_date), UUID(tx_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidRequestException("Invalid cursor") from exc
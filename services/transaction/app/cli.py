@@ -0,0 +1,27 @@
+"""Maintenance commands for the Transactions Service (`python -m app.cli --help`)."""
+
+import argparse
+
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.domain.positions import rebuild_positions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "rebuild-positions",
+        help="Recompute the position projection from the transaction log",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild-positions":
+        with Session(engine) as session:
+            count = rebuild_positions(session)
+        print(f"Rebuilt {count} positions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,73 @@
 from pydantic import BaseModel
 import os
+import tempfile
+
+# ISO 4217 codes accepted for transactions unless ALLOWED_CURRENCIES overrides them.
+DEFAULT_CURRENCIES = (
+    "USD,EUR,GBP,CHF,JPY,CAD,AUD,NZD,SEK,NOK,DKK,PLN,CZK,HUF,RON,"
+    "HKD,SGD,CNY,INR,KRW,BRL,MXN,ZAR,TRY,ILS"
+)
 
 
 class Settings(BaseModel):
     database_url: str
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    portfolio_engine: str = "projection"
+    snapshot_cache_ttl_seconds: float = 0.0
+    import_jobs_dir: str | None = None
+    import_job_workers: int = 2
+    import_job_lease_seconds: float = 300.0
+    outbox_broker: str = "file"
+    outbox_path: str
+    checkpoint_every_events: int = 1000
+    price_cache_size: int = 100_000
+    transaction_batch_max_items: int = 1000
+    idempotency_bloom_capacity: int = 1_000_000
+    idempotency_cache_size: int = 100_000
+    compression_minimum_size: int = 1024
+    profiling_enabled: bool = False
+    log_queue_size: int = 10_000
+    request_log_sample_rate: float = 1.0
+    allowed_currencies: list[str]
 
 
 def get_settings() -> Settings:
     return Settings(
-        database_url=os.getenv("DATABASE_URL")
+        database_url=os.getenv("DATABASE_URL"),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        portfolio_engine=os.getenv("PORTFOLIO_ENGINE", "projection"),
+        snapshot_cache_ttl_seconds=float(os.getenv("SNAPSHOT_CACHE_TTL_SECONDS", "0")),
+        # Uploads of async import jobs, read again when a job resumes: must be persistent
+        # and shared by every replica. Unset disables POST /imports/jobs.
+        import_jobs_dir=os.getenv("IMPORT_JOBS_DIR") or None,
+        import_job_workers=int(os.getenv("IMPORT_JOB_WORKERS", "2")),
+        # A RUNNING job without a committed batch for this long is taken over by another worker.
+        import_job_lease_seconds=float(os.getenv("IMPORT_JOB_LEASE_SECONDS", "300")),
+        # "file" (NDJSON), "sqlite" or "none" to leave events in the outbox table.
+        outbox_broker=os.getenv("OUTBOX_BROKER", "file"),
+        outbox_path=os.getenv(
+            "OUTBOX_PATH", os.path.join(tempfile.gettempdir(), "transactions-outbox.log")
+        ),
+        # Portfolio checkpoint written every N created transactions, 0 disables it.
+        checkpoint_every_events=int(os.getenv("CHECKPOINT_EVERY_EVENTS", "1000")),
+        price_cache_size=int(os.getenv("PRICE_CACHE_SIZE", "100000")),
+        transaction_batch_max_items=int(os.getenv("TRANSACTION_BATCH_MAX_ITEMS", "1000")),
+        # Expected number of idempotency keys (bloom filter sizing, ~1.2 MB per million at 1%).
+        idempotency_bloom_capacity=int(os.getenv("IDEMPOTENCY_BLOOM_CAPACITY", "1000000")),
+        idempotency_cache_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "100000")),
+        # Responses smaller than this (bytes) are sent uncompressed.
+        compression_minimum_size=int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")),
+        # Lets clients profile a request with the X-Profile header; keep off in production.
+        profiling_enabled=os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes"),
+        # Records waiting for the log writer thread; beyond this they are dropped, never blocking.
+        log_queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        # Share of successful requests logged as "request" (errors are always logged).
+        request_log_sample_rate=float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1")),
+        allowed_currencies=[
+            code.strip().upper() for code in os.getenv("ALLOWED_CURRENCIES", DEFAULT_CURRENCIES).split(",")
+        ],
     )
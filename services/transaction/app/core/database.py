@@ -1,15 +1,71 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
-from .config import get_settings
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .config import Settings, get_settings
 
 settings = get_settings()
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _pool_options(url: str, settings: Settings) -> dict:
+    # SQLite uses its own single-file pools; sizing only applies to server databases.
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
 engine = create_engine(
     settings.database_url,
     echo=False,
     pool_pre_ping=True,
+    **_pool_options(settings.database_url, settings),
+)
+
+async_engine = create_async_engine(
+    to_async_url(settings.database_url),
+    echo=False,
+    pool_pre_ping=True,
+    **_pool_options(settings.database_url, settings),
 )
 
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    # expire_on_commit=False: returned ORM objects stay readable after commit
+    # without an implicit (sync) refresh.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def upsert_rows(session: Session, model: type[SQLModel], rows: list[dict], key_columns: list[str]) -> None:
+    # INSERT .. ON CONFLICT DO UPDATE of the non-key columns (Postgres and SQLite share the syntax).
+    # A statement can't touch the same row twice, so callers pass rows with distinct keys.
+    dialect_insert = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(model)
+    update_columns = [name for name in rows[0] if name not in key_columns]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: stmt.excluded[name] for name in update_columns},
+    )
+    session.execute(stmt, rows)
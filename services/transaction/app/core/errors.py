@@ -2,4 +2,8 @@ class NotFoundException(Exception):
     """Raised when a requested resource does not exist."""
 
 
-__all__ = ["NotFoundException"]
+class InvalidRequestException(Exception):
+    """Raised when request parameters are well-typed but unusable (e.g. a malformed cursor)."""
+
+
+__all__ = ["InvalidRequestException", "NotFoundException"]
@@ -1,6 +1,7 @@
 import logging
+from collections import defaultdict, deque
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Callable, Deque, Dict, List
 
 logger = logging.getLogger("transactions_service.events")
 
@@ -11,13 +12,36 @@ class DomainEvent:
     payload: Dict[str, Any]
 
 
+TRANSACTION_CREATED = "TransactionCreated"
+TRANSACTION_DELETED = "TransactionDeleted"
+PRICES_UPDATED = "PricesUpdated"
+FX_RATES_UPDATED = "FxRatesUpdated"
+
+
 class InMemoryEventBus:
-    def __init__(self) -> None:
-        self._events: List[DomainEvent] = []
+    """In-process dispatch to subscribers (e.g. cache invalidation).
+
+    Durable delivery goes through the outbox (`app/core/outbox.py`); the
+    bounded ring buffer of recent events only exists for tests/debugging.
+    """
+
+    def __init__(self, max_events: int = 1000) -> None:
+        self._events: Deque[DomainEvent] = deque(maxlen=max_events)
+        self._subscribers: Dict[str, List[Callable[[DomainEvent], None]]] = defaultdict(list)
+
+    def subscribe(self, name: str, handler: Callable[[DomainEvent], None]) -> None:
+        self._subscribers[name].append(handler)
+
+    def unsubscribe(self, name: str, handler: Callable[[DomainEvent], None]) -> None:
+        if handler in self._subscribers.get(name, ()):
+            self._subscribers[name].remove(handler)
 
     def publish(self, event: DomainEvent) -> None:
         self._events.append(event)
+        # The payload is serialized by the log writer thread (app/core/logs.py), not here.
         logger.info("event_published", extra={"event_name": event.name, "payload": event.payload})
+        for handler in self._subscribers.get(event.name, ()):
+            handler(event)
 
     def list_events(self) -> List[DomainEvent]:
         return list(self._events)
@@ -28,12 +52,3 @@ class InMemoryEventBus:
 
 event_bus = InMemoryEventBus()
 
-
-def publish_transaction_created(event: Dict[str, Any]) -> None:
-    domain_event = DomainEvent(name="TransactionCreated", payload=event)
-    event_bus.publish(domain_event)
-
-
-def publish_transaction_deleted(event: Dict[str, Any]) -> None:
-    domain_event = DomainEvent(name="TransactionDeleted", payload=event)
-    event_bus.publish(domain_event)
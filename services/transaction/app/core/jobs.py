@@ -0,0 +1,42 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+from .config import get_settings
+
+logger = logging.getLogger("transactions_service.jobs")
+
+
+class JobRunner:
+    """Small background worker pool for long running jobs (e.g. CSV imports)."""
+
+    def __init__(self, max_workers: int, name: str = "job") -> None:
+        self._max_workers = max_workers
+        self._name = name
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: set[Future] = set()
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix=self._name)
+        future = self._executor.submit(fn, *args)
+        self._futures.add(future)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def join(self, timeout: float | None = None) -> None:
+        wait(list(self._futures), timeout=timeout)
+
+    def shutdown(self) -> None:
+        # Queued jobs are dropped; they stay pending in the DB and resume on the next start.
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _on_done(self, future: Future) -> None:
+        self._futures.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("job_failed", exc_info=future.exception())
+
+
+job_runner = JobRunner(max_workers=get_settings().import_job_workers)
@@ -0,0 +1,120 @@
+"""Non-blocking log pipeline.
+
+Loggers only put records on a bounded queue; a background QueueListener
+formats them (JSON serialization of `extra` payloads included) and writes
+them in batches, so slow stdout never stalls the request path. When the queue
+is full, records are dropped and counted instead of blocking the caller.
+"""
+
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Lines written to the stream per write()/flush() at most.
+LOG_BATCH_SIZE = 256
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve only what can't safely cross threads: message args and the
+        # traceback. `extra` values stay as objects and are serialized by the
+        # formatter on the listener thread.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Called under the handler lock.
+        try:
+            if self.dropped:
+                self.queue.put_nowait(_dropped_record(self.dropped))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _dropped_record(count: int) -> logging.LogRecord:
+    return logging.makeLogRecord(
+        {
+            "name": "transactions_service.logs",
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": "log_records_dropped",
+            "dropped": count,
+        }
+    )
+
+
+class BatchingStreamHandler(logging.StreamHandler):
+    """Buffers formatted lines and writes them with a single write()/flush()."""
+
+    def __init__(self, stream=None, batch_size: int = LOG_BATCH_SIZE) -> None:
+        super().__init__(stream)
+        self.batch_size = batch_size
+        self._buffer: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._buffer.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            lines = "".join(self._buffer)
+            self._buffer.clear()
+            try:
+                if lines:
+                    self.stream.write(lines)
+                if hasattr(self.stream, "flush"):
+                    self.stream.flush()
+            except ValueError:
+                # The stream was closed under us (interpreter shutdown): nothing to write to.
+                pass
+
+
+class BatchingQueueListener(QueueListener):
+    """Started on import and by each app startup, stopped (and drained) by the app shutdown."""
+
+    def start(self) -> None:
+        if self._thread is None:
+            super().start()
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        # Write out the pending batch before waiting on an empty queue.
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+        return self.queue.get(block)
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            super().stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
+def install_queue_logging(
+    logger: logging.Logger, formatter: logging.Formatter, queue_size: int, stream=None
+) -> BatchingQueueListener:
+    """Route `logger` through a bounded queue to a batched stream handler (stdout by default)."""
+    handler = BatchingStreamHandler(stream or sys.stdout)
+    handler.setFormatter(formatter)
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    logger.handlers = [DroppingQueueHandler(log_queue)]
+    listener = BatchingQueueListener(log_queue, handler)
+    listener.start()
+    return listener
@@ -0,0 +1,121 @@
+"""Transactional outbox: events are stored with the data and relayed in batches."""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Protocol
+
+from sqlalchemy import Engine, delete, insert
+from sqlmodel import Session, select
+
+from app.core.config import Settings
+from app.core.events import DomainEvent
+from app.domain.models import OutboxEvent, utcnow
+
+logger = logging.getLogger("transactions_service.outbox")
+
+
+class Broker(Protocol):
+    def publish_batch(self, events: list[DomainEvent]) -> None:
+        """Deliver the events durably or raise; the relay retries on failure."""
+
+
+class FileBroker:
+    """Local stand-in broker appending one JSON line per event."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def publish_batch(self, events: list[DomainEvent]) -> None:
+        lines = "".join(json.dumps({"name": e.name, "payload": e.payload}) + "\n" for e in events)
+        with open(self.path, "a", encoding="utf-8") as log:
+            log.write(lines)
+            log.flush()
+            os.fsync(log.fileno())
+
+
+class SQLiteBroker:
+    """Local stand-in broker storing events in a SQLite log table."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS event_log ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, payload TEXT NOT NULL)"
+            )
+
+    def publish_batch(self, events: list[DomainEvent]) -> None:
+        with sqlite3.connect(self.path) as connection:
+            connection.executemany(
+                "INSERT INTO event_log (name, payload) VALUES (?, ?)",
+                [(e.name, json.dumps(e.payload)) for e in events],
+            )
+
+
+def stage_events(session: Session, events: list[DomainEvent]) -> None:
+    # Part of the caller's DB transaction: committed (or rolled back) with the data.
+    if events:
+        created_at = utcnow()
+        session.execute(
+            insert(OutboxEvent),
+            [{"name": e.name, "payload": e.payload, "created_at": created_at} for e in events],
+        )
+
+
+class OutboxRelay:
+    """Background thread draining the outbox into a broker (at-least-once)."""
+
+    def __init__(self, bind: Engine, broker: Broker, batch_size: int = 500, poll_interval: float = 1.0) -> None:
+        self.bind = bind
+        self.broker = broker
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def drain_once(self) -> int:
+        with Session(self.bind) as session:
+            stmt = select(OutboxEvent).order_by(OutboxEvent.id).limit(self.batch_size)
+            if self.bind.dialect.name == "postgresql":
+                # Lets several relays share the table without publishing the same rows twice.
+                stmt = stmt.with_for_update(skip_locked=True)
+            rows = session.exec(stmt).all()
+            if not rows:
+                return 0
+            self.broker.publish_batch([DomainEvent(name=row.name, payload=row.payload) for row in rows])
+            # A crash between publish and commit re-delivers the batch: consumers must dedupe on payload id.
+            session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([row.id for row in rows])))
+            session.commit()
+            return len(rows)
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                drained = self.drain_once()
+            except Exception:
+                logger.exception("outbox_relay_failed")
+                drained = 0
+            if drained < self.batch_size:
+                self._stopped.wait(self.poll_interval)
+
+
+def build_broker(settings: Settings) -> Broker | None:
+    if settings.outbox_broker == "file":
+        return FileBroker(settings.outbox_path)
+    if settings.outbox_broker == "sqlite":
+        return SQLiteBroker(settings.outbox_path)
+    return None
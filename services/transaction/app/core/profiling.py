@@ -0,0 +1,61 @@
+"""Opt-in request profiling with cProfile.
+
+With PROFILING_ENABLED set, a request carrying ``X-Profile: cumulative`` (or
+``tottime``) is run under the profiler and answered with the pstats report
+instead of its body. cProfile follows the event loop thread, so async
+endpoints and their ``run_sync`` work are covered; sync endpoints running in
+the threadpool only show up as awaited. Concurrent requests on the same loop
+are profiled too, so use it on a quiet instance. Only one profiler can be
+active at a time: a request arriving while another is profiled is served
+normally and marked with ``X-Profile-Skipped``.
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+
+from fastapi import Request, Response
+from fastapi.responses import PlainTextResponse
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_SORT_KEYS = ("cumulative", "tottime")
+PROFILE_TOP_FUNCTIONS = 60
+PROFILE_SKIPPED_HEADER = "X-Profile-Skipped"
+
+_profiler_lock = threading.Lock()
+
+
+async def profile_request(request: Request, call_next) -> Response:
+    sort_key = request.headers[PROFILE_HEADER].lower()
+    if sort_key not in PROFILE_SORT_KEYS:
+        sort_key = PROFILE_SORT_KEYS[0]
+
+    if not _profiler_lock.acquire(blocking=False):
+        return await _unprofiled(request, call_next, "another request is being profiled")
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (sys.setprofile/sys.monitoring) already owns the interpreter.
+            return await _unprofiled(request, call_next, "another profiler is active")
+        try:
+            response = await call_next(request)
+            # Streaming bodies are produced while iterating: drain them under the profiler.
+            async for _ in response.body_iterator:
+                pass
+        finally:
+            profiler.disable()
+    finally:
+        _profiler_lock.release()
+
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats(sort_key).print_stats(PROFILE_TOP_FUNCTIONS)
+    return PlainTextResponse(report.getvalue(), headers={"X-Profiled-Status": str(response.status_code)})
+
+
+async def _unprofiled(request: Request, call_next, reason: str) -> Response:
+    response = await call_next(request)
+    response.headers[PROFILE_SKIPPED_HEADER] = reason
+    return response
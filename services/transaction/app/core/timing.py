@@ -0,0 +1,198 @@
+"""Per-request phase timings and in-process Prometheus histograms.
+
+The request middleware opens a `RequestTimings` for each request; code on the
+hot path wraps its phases in `span(...)` and SQL statements are timed through
+engine events. Outside a request (jobs, relay, tests calling domain code) the
+helpers are no-ops. Durations use `time.perf_counter()`.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Phases reported in Server-Timing and /metrics. Spans may nest: `hydrate`
+# includes the SQL time of its own queries, which is also reported as `db`.
+PHASE_DESCRIPTIONS = {
+    "db": "SQL execution",
+    "hydrate": "Row loading",
+    "compute": "Domain compute",
+    "serialize": "Serialization",
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class RequestTimings:
+    phases: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    queries: int = 0
+    rows: int = 0
+
+    def server_timing(self, total: float) -> str:
+        metrics = []
+        for name, seconds in self.phases.items():
+            description = PHASE_DESCRIPTIONS.get(name, name)
+            if name == "db":
+                description = f"{description}: {self.queries} queries / {self.rows} rows"
+            metrics.append(f'{name};dur={seconds * 1000:.2f};desc="{description}"')
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    # Child tasks and threadpool calls copy the context, so they share this object.
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[name] += time.perf_counter() - start
+
+
+def add_rows(count: int) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.rows += count
+
+
+def counted(rows: Iterable) -> Iterable:
+    """Count rows as they are consumed (for results folded while streaming)."""
+    timings = _current.get()
+    if timings is None:
+        return rows
+    return _counting(rows, timings)
+
+
+def _counting(rows: Iterable, timings: RequestTimings) -> Iterator:
+    for row in rows:
+        timings.rows += 1
+        yield row
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    timings = _current.get()
+    starts = conn.info.get("query_start")
+    if timings is None or not starts:
+        return
+    timings.phases["db"] += time.perf_counter() - starts.pop()
+    timings.queries += 1
+
+
+def instrument_sql() -> None:
+    # On the Engine class, so every engine (async ones included) is timed.
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram keyed by label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            # Per-bucket counts, then sum and count.
+            series = self._series.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template.",
+    ("method", "route", "status"),
+)
+PHASE_DURATION = Histogram(
+    "http_request_phase_duration_seconds",
+    "Time spent per request phase (db, hydrate, compute, serialize).",
+    ("route", "phase"),
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request.",
+    ("route",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250),
+)
+
+
+def route_template(scope) -> str:
+    # scope["route"] only carries the path relative to its included router, so the
+    # template is rebuilt from the request path: /portfolios/{portfolio_id}/transactions.
+    # Unmatched paths share one label to keep the series count bounded.
+    if "route" not in scope:
+        return "unmatched"
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{names[segment]}}}" if segment in names else segment for segment in scope["path"].split("/"))
+
+
+def observe_request(method: str, route: str, status_code: int, total: float, timings: RequestTimings) -> None:
+    REQUEST_DURATION.observe(total, method, route, str(status_code))
+    for phase, seconds in timings.phases.items():
+        PHASE_DURATION.observe(seconds, route, phase)
+    DB_QUERIES.observe(timings.queries, route)
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in (REQUEST_DURATION, PHASE_DURATION, DB_QUERIES):
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,175 @@
+"""Persisted checkpoints of the portfolio accumulator.
+
+A checkpoint stores the per-asset entries of `accumulate_positions` after all
+transactions up to a `Transaction.seq`. Loading the state replays only the
+transactions inserted after the latest checkpoint.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import Engine, delete, func
+from sqlmodel import Session, select
+
+from app.core.events import TRANSACTION_CREATED, DomainEvent, event_bus
+from app.core.jobs import JobRunner
+from app.domain.ledger import select_ledger
+from app.domain.models import DEFAULT_PORTFOLIO_ID, PortfolioCheckpoint, Transaction
+from app.domain.portfolio import fold_transactions
+
+logger = logging.getLogger("transactions_service.checkpoints")
+
+# Older checkpoints are pruned; a few are kept so a delete only rolls back to the previous one.
+CHECKPOINTS_KEPT = 3
+
+# First key of the two-key advisory locks guarding seq assignment, one per portfolio.
+SEQ_LOCK_CLASS = 1
+
+# Own single worker: checkpoints must not queue behind long CSV imports on job_runner.
+checkpoint_runner = JobRunner(max_workers=1, name="checkpoint")
+
+
+def load_entries(session: Session, portfolio_id: str, upto_seq: int | None = None) -> dict[tuple[str, str], dict]:
+    checkpoint_stmt = (
+        select(PortfolioCheckpoint)
+        .where(PortfolioCheckpoint.portfolio_id == portfolio_id)
+        .order_by(PortfolioCheckpoint.seq.desc())
+        .limit(1)
+    )
+    newer_stmt = select_ledger(portfolio_id)
+    if upto_seq is not None:
+        checkpoint_stmt = checkpoint_stmt.where(PortfolioCheckpoint.seq <= upto_seq)
+        newer_stmt = newer_stmt.where(Transaction.seq <= upto_seq)
+
+    checkpoint = session.exec(checkpoint_stmt).first()
+    if checkpoint is None:
+        return fold_transactions({}, session.exec(newer_stmt))
+
+    per_asset = {(entry["asset_id"], entry["currency"]): _decode_entry(entry) for entry in checkpoint.state}
+    newer = session.exec(newer_stmt.where(Transaction.seq > checkpoint.seq)).all()
+
+    # A backdated trade changes which price/metadata is the most recent, so its
+    # key is replayed from the full history instead of folded onto the checkpoint.
+    backdated = {
+        (tx.asset_id, tx.currency)
+        for tx in newer
+        if (tx.asset_id, tx.currency) in per_asset
+        and tx.trade_date < per_asset[(tx.asset_id, tx.currency)]["last_trade_date"]
+    }
+    for asset_id, currency in backdated:
+        history = session.exec(
+            newer_stmt.where(Transaction.asset_id == asset_id, Transaction.currency == currency)
+        )
+        per_asset[(asset_id, currency)] = fold_transactions({}, history)[(asset_id, currency)]
+
+    return fold_transactions(per_asset, (tx for tx in newer if (tx.asset_id, tx.currency) not in backdated))
+
+
+def lock_seq(session: Session, portfolio_id: str, exclusive: bool = False) -> None:
+    """Advisory lock on a portfolio's seq assignment until the DB transaction ends (Postgres only).
+
+    Writers hold it shared from before their INSERT assigns a seq until commit;
+    write_checkpoint takes it exclusive, so it only waits for in-flight inserts
+    of that portfolio and never blocks the others.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        # SQLite serializes writers and assigns MAX(seq) + 1 inside the INSERT.
+        return
+    lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    session.exec(select(lock(SEQ_LOCK_CLASS, func.hashtext(portfolio_id)))).one()
+
+
+def write_checkpoint(
+    session: Session, portfolio_id: str = DEFAULT_PORTFOLIO_ID
+) -> PortfolioCheckpoint | None:
+    """Checkpoint the state up to the highest committed seq; None when nothing changed."""
+    # Waits for in-flight inserts of this portfolio: once granted, every
+    # seq <= MAX(seq) is committed and visible, and later inserts get higher seqs.
+    lock_seq(session, portfolio_id, exclusive=True)
+    upto_seq = session.exec(
+        select(func.max(Transaction.seq)).where(Transaction.portfolio_id == portfolio_id)
+    ).one()
+    session.commit()
+
+    latest = session.exec(
+        select(func.max(PortfolioCheckpoint.seq)).where(PortfolioCheckpoint.portfolio_id == portfolio_id)
+    ).one()
+    if upto_seq is None or (latest is not None and latest >= upto_seq):
+        return None
+
+    entries = load_entries(session, portfolio_id, upto_seq)
+    checkpoint = PortfolioCheckpoint(
+        portfolio_id=portfolio_id, seq=upto_seq, state=[_encode_entry(entry) for entry in entries.values()]
+    )
+    session.add(checkpoint)
+    session.flush()
+    kept = (
+        select(PortfolioCheckpoint.id)
+        .where(PortfolioCheckpoint.portfolio_id == portfolio_id)
+        .order_by(PortfolioCheckpoint.seq.desc())
+        .limit(CHECKPOINTS_KEPT)
+    )
+    session.execute(
+        delete(PortfolioCheckpoint).where(
+            PortfolioCheckpoint.portfolio_id == portfolio_id, PortfolioCheckpoint.id.not_in(kept)
+        )
+    )
+    session.commit()
+    session.refresh(checkpoint)
+    return checkpoint
+
+
+def discard_checkpoints(session: Session, transaction: Transaction) -> None:
+    # Checkpoints that include a deleted transaction are stale; part of the caller's DB transaction.
+    stmt = delete(PortfolioCheckpoint).where(PortfolioCheckpoint.portfolio_id == transaction.portfolio_id)
+    if transaction.seq is not None:
+        stmt = stmt.where(PortfolioCheckpoint.seq >= transaction.seq)
+    session.execute(stmt)
+
+
+class CheckpointScheduler:
+    """Writes a portfolio's checkpoint in the background every `every_events` transactions created in it."""
+
+    def __init__(self, bind: Engine, every_events: int) -> None:
+        self.bind = bind
+        self.every_events = every_events
+        self._counts: dict[str, int] = defaultdict(int)
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        event_bus.subscribe(TRANSACTION_CREATED, self.on_event)
+
+    def stop(self) -> None:
+        event_bus.unsubscribe(TRANSACTION_CREATED, self.on_event)
+        checkpoint_runner.shutdown()
+
+    def on_event(self, event: DomainEvent) -> None:
+        portfolio_id = event.payload["portfolio_id"]
+        with self._lock:
+            self._counts[portfolio_id] += 1
+            if self._counts[portfolio_id] < self.every_events or portfolio_id in self._running:
+                return
+            self._counts[portfolio_id] = 0
+            self._running.add(portfolio_id)
+        checkpoint_runner.submit(self._write, portfolio_id)
+
+    def _write(self, portfolio_id: str) -> None:
+        try:
+            with Session(self.bind) as session:
+                checkpoint = write_checkpoint(session, portfolio_id)
+            if checkpoint is not None:
+                logger.info("checkpoint_written", extra={"portfolio_id": portfolio_id, "seq": checkpoint.seq})
+        finally:
+            with self._lock:
+                self._running.discard(portfolio_id)
+
+
+def _encode_entry(entry: dict) -> dict:
+    return {**entry, "last_trade_date": entry["last_trade_date"].isoformat()}
+
+
+def _decode_entry(entry: dict) -> dict:
+    return {**entry, "last_trade_date": date.fromisoformat(entry["last_trade_date"])}
@@ -0,0 +1,70 @@
+from datetime import date
+from enum import Enum
+
+from sqlmodel import Session
+
+from app.core.timing import add_rows, counted, span
+from app.domain import checkpoints
+from app.domain.fx import convert_entries, fx_rates
+from app.domain.ledger import select_ledger
+from app.domain.models import DEFAULT_PORTFOLIO_ID
+from app.domain.portfolio import PortfolioSnapshot, build_snapshot_from_entries, fold_transactions
+from app.domain.portfolio_sql import aggregate_entries
+from app.domain.positions import list_positions
+from app.domain.prices import apply_marks
+
+
+class PortfolioEngine(str, Enum):
+    # Reads the incrementally maintained `position` table (O(holdings)).
+    PROJECTION = "projection"
+    # Replays the full transaction log with the pure-Python accumulator.
+    REPLAY = "replay"
+    # Replays the full transaction log with NumPy grouped reductions (optional dependency).
+    COLUMNAR = "columnar"
+    # Loads the latest persisted checkpoint and replays only newer transactions.
+    CHECKPOINT = "checkpoint"
+    # Aggregates the transaction log in the database (GROUP BY), one row per holding.
+    SQL = "sql"
+
+
+class EngineUnavailable(Exception):
+    """Raised when the selected engine needs an optional dependency that is missing."""
+
+
+def compute_snapshot(
+    session: Session,
+    engine: PortfolioEngine,
+    base_currency: str | None = None,
+    portfolio_id: str = DEFAULT_PORTFOLIO_ID,
+) -> PortfolioSnapshot:
+    # Every engine yields the same per-asset entries; holdings are then valued at
+    # market prices and, when requested, converted to one currency.
+    with span("hydrate"):
+        entries = compute_entries(session, engine, portfolio_id)
+    with span("compute"):
+        entries = apply_marks(session, entries)
+        if base_currency is not None:
+            entries = convert_entries(entries, fx_rates.matrix(session, date.today()), base_currency)
+        return build_snapshot_from_entries(entries)
+
+
+def compute_entries(session: Session, engine: PortfolioEngine, portfolio_id: str) -> list[dict]:
+    # Already ordered by trade_date in SQL, so rows are folded as they stream in.
+    # Rows are counted for the Server-Timing `db` metric (no-op outside a request).
+    transactions = select_ledger(portfolio_id)
+    if engine == PortfolioEngine.REPLAY:
+        return list(fold_transactions({}, counted(session.exec(transactions))).values())
+    if engine == PortfolioEngine.CHECKPOINT:
+        return list(checkpoints.load_entries(session, portfolio_id).values())
+    if engine == PortfolioEngine.COLUMNAR:
+        try:
+            from app.domain.portfolio_columnar import accumulate_columns, columns_from_rows
+        except ImportError as exc:
+            raise EngineUnavailable("The columnar engine requires the optional 'numpy' dependency") from exc
+        return list(accumulate_columns(columns_from_rows(counted(session.exec(transactions)))).values())
+    if engine == PortfolioEngine.SQL:
+        entries = aggregate_entries(session, portfolio_id)
+    else:
+        entries = list_positions(session, portfolio_id)
+    add_rows(len(entries))
+    return entries
@@ -0,0 +1,147 @@
+"""FX rates and conversion of portfolio entries to a base currency."""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import and_, func
+from sqlmodel import Session, select
+
+from app.core import outbox
+from app.core.database import upsert_rows
+from app.core.events import FX_RATES_UPDATED, DomainEvent, event_bus
+from app.domain.models import FxRate
+
+# Stored rates are quoted against this currency, which therefore needs no rows.
+FX_PIVOT_CURRENCY = "USD"
+# Rate matrices kept in memory, one per valuation date.
+FX_CACHE_DATES = 32
+
+
+class FxRateUnavailable(Exception):
+    """Raised when a holding's currency has no rate on or before the valuation date."""
+
+
+@dataclass(frozen=True)
+class RateMatrix:
+    on: date
+    currencies: tuple[str, ...]
+    # rates[i][j]: units of currencies[j] for one unit of currencies[i].
+    rates: tuple[tuple[float, ...], ...]
+
+    @classmethod
+    def from_pivot_rates(cls, on: date, pivot_rates: dict[str, float]) -> "RateMatrix":
+        currencies = tuple(sorted({FX_PIVOT_CURRENCY, *pivot_rates}))
+        to_pivot = [1.0 if currency == FX_PIVOT_CURRENCY else pivot_rates[currency] for currency in currencies]
+        return cls(
+            on=on,
+            currencies=currencies,
+            rates=tuple(tuple(source / target for target in to_pivot) for source in to_pivot),
+        )
+
+    def factors(self, currencies: Iterable[str], base_currency: str) -> dict[str, float]:
+        """Factors converting each of ``currencies`` into ``base_currency``.
+
+        The base itself needs no rate, so converting holdings that are all in
+        the base currency works even when no rate is stored at all.
+        """
+        sources = set(currencies) - {base_currency}
+        if not sources:
+            return {}
+        missing = {*sources, base_currency}.difference(self.currencies)
+        if missing:
+            raise FxRateUnavailable(f"No FX rate for {', '.join(sorted(missing))} on or before {self.on.isoformat()}")
+        target = self.currencies.index(base_currency)
+        return {currency: self.rates[self.currencies.index(currency)][target] for currency in sources}
+
+
+class FxService:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def upsert_rates(self, rates: list[FxRate]) -> int:
+        """Insert or overwrite rates and commit; returns the number of distinct rows written."""
+        rows = {(rate.currency, rate.rate_date): rate.model_dump() for rate in rates}
+        if not rows:
+            return 0
+        upsert_rows(self.session, FxRate, list(rows.values()), ["currency", "rate_date"])
+
+        event = DomainEvent(
+            name=FX_RATES_UPDATED, payload={"currencies": sorted({currency for currency, _ in rows})}
+        )
+        outbox.stage_events(self.session, [event])
+        self.session.commit()
+        event_bus.publish(event)
+        return len(rows)
+
+
+class FxRateCache:
+    """Process-local rate matrices by valuation date, dropped on any rate update."""
+
+    def __init__(self, max_dates: int = FX_CACHE_DATES) -> None:
+        self._lock = threading.Lock()
+        self._max_dates = max_dates
+        self._generation = 0
+        self._matrices: OrderedDict[date, RateMatrix] = OrderedDict()
+
+    def matrix(self, session: Session, on: date) -> RateMatrix:
+        with self._lock:
+            generation = self._generation
+            cached = self._matrices.get(on)
+            if cached is not None:
+                self._matrices.move_to_end(on)
+                return cached
+
+        matrix = RateMatrix.from_pivot_rates(on, _latest_rates(session, on))
+        with self._lock:
+            if generation == self._generation:
+                self._matrices[on] = matrix
+                while len(self._matrices) > self._max_dates:
+                    self._matrices.popitem(last=False)
+        return matrix
+
+    def invalidate(self, event: DomainEvent | None = None) -> None:
+        with self._lock:
+            self._generation += 1
+            self._matrices.clear()
+
+
+def convert_entries(entries: Iterable[dict], matrix: RateMatrix, base_currency: str) -> list[dict]:
+    """Express invested and last_price of held entries in ``base_currency``.
+
+    ``currency`` keeps the instrument currency, so the allocation by currency
+    shows the exposure per currency valued in the base currency. Invested
+    capital is translated at the same (latest) rate as the market value.
+    """
+    entries = list(entries)
+    factors = matrix.factors({entry["currency"] for entry in entries if entry["quantity"] > 0}, base_currency)
+    if not factors:
+        return entries
+    converted = []
+    for entry in entries:
+        factor = factors.get(entry["currency"]) if entry["quantity"] > 0 else None
+        if factor is not None:
+            entry = {**entry, "invested": entry["invested"] * factor, "last_price": entry["last_price"] * factor}
+        converted.append(entry)
+    return converted
+
+
+def _latest_rates(session: Session, on: date) -> dict[str, float]:
+    latest = (
+        select(FxRate.currency, func.max(FxRate.rate_date).label("rate_date"))
+        .where(FxRate.rate_date <= on)
+        .group_by(FxRate.currency)
+        .subquery()
+    )
+    rows = session.exec(
+        select(FxRate.currency, FxRate.rate).join(
+            latest, and_(FxRate.currency == latest.c.currency, FxRate.rate_date == latest.c.rate_date)
+        )
+    )
+    return dict(rows.all())
+
+
+fx_rates = FxRateCache()
+event_bus.subscribe(FX_RATES_UPDATED, fx_rates.invalidate)
@@ -0,0 +1,142 @@
+"""In-process index of idempotency keys, to skip the lookup SELECT for new keys.
+
+The bloom filter holds every (portfolio_id, key) committed by this process or
+loaded by ``warm``; a negative answer means the key is new unless another
+process inserted it, in which case the unique index rejects the INSERT and
+TransactionService falls back to the SELECT. The LRU maps recent keys to
+their transaction id; callers confirm hits with ``session.get`` since the
+transaction may have been deleted since.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+from uuid import UUID
+
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.domain.models import Transaction
+
+logger = logging.getLogger("transactions_service.idempotency")
+
+IdempotencyKey = tuple[str, str]  # (portfolio_id, idempotency_key)
+
+WARM_BATCH_SIZE = 10_000
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def update(self, other: "BloomFilter") -> None:
+        merged = int.from_bytes(self._bits, "little") | int.from_bytes(other._bits, "little")
+        self._bits = bytearray(merged.to_bytes(len(self._bits), "little"))
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def _positions(self, value: str):
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest.
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+
+class IdempotencyIndex:
+    def __init__(self, capacity: int, max_entries: int) -> None:
+        self._lock = threading.Lock()
+        self._capacity = capacity
+        self._max_entries = max_entries
+        self._generation = 0
+        self._bloom = BloomFilter(capacity)
+        self._recent: OrderedDict[IdempotencyKey, UUID] = OrderedDict()
+        # Until warm() completes, keys written before this process started are unknown.
+        self._ready = False
+
+    def might_exist(self, portfolio_id: str, key: str) -> bool:
+        with self._lock:
+            return not self._ready or _member(portfolio_id, key) in self._bloom
+
+    def lookup(self, portfolio_id: str, key: str) -> UUID | None:
+        with self._lock:
+            tx_id = self._recent.get((portfolio_id, key))
+            if tx_id is not None:
+                self._recent.move_to_end((portfolio_id, key))
+            return tx_id
+
+    def remember(self, portfolio_id: str, entries: list[tuple[str, UUID]]) -> None:
+        with self._lock:
+            for key, tx_id in entries:
+                self._bloom.add(_member(portfolio_id, key))
+                self._recent[(portfolio_id, key)] = tx_id
+                self._recent.move_to_end((portfolio_id, key))
+            while len(self._recent) > self._max_entries:
+                self._recent.popitem(last=False)
+
+    def forget(self, portfolio_id: str, key: str) -> None:
+        # Bloom filters can't remove members; the stale bit only costs a SELECT.
+        with self._lock:
+            self._recent.pop((portfolio_id, key), None)
+
+    def warm(self, bind: Engine) -> int:
+        """Load every stored key into the bloom filter; returns the number of keys."""
+        with self._lock:
+            generation = self._generation
+        bloom = BloomFilter(self._capacity)
+        count = 0
+        stmt = (
+            select(Transaction.portfolio_id, Transaction.idempotency_key)
+            .where(Transaction.idempotency_key.is_not(None))
+            .execution_options(yield_per=WARM_BATCH_SIZE)
+        )
+        with Session(bind) as session:
+            for portfolio_id, key in session.exec(stmt):
+                bloom.add(_member(portfolio_id, key))
+                count += 1
+        with self._lock:
+            if generation != self._generation:
+                return count
+            # Keys remembered while warming are already in the old filter; merge them.
+            self._bloom.update(bloom)
+            self._ready = True
+        logger.info("idempotency_index_warmed", extra={"keys": count})
+        return count
+
+    def start_warming(self, bind: Engine) -> threading.Thread:
+        """Run ``warm`` on its own daemon thread, so it never queues behind import jobs."""
+        thread = threading.Thread(target=self._warm_logged, args=(bind,), name="idempotency-warm", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_logged(self, bind: Engine) -> None:
+        try:
+            self.warm(bind)
+        except Exception:
+            # Not ready: keys keep being looked up in the database.
+            logger.exception("idempotency_index_warm_failed")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._bloom = BloomFilter(self._capacity)
+            self._recent.clear()
+            self._ready = False
+
+
+def _member(portfolio_id: str, key: str) -> str:
+    return f"{portfolio_id}\x00{key}"
+
+
+idempotency_index = IdempotencyIndex(
+    capacity=get_settings().idempotency_bloom_capacity, max_entries=get_settings().idempotency_cache_size
+)
@@ -0,0 +1,31 @@
+"""Lean reads of the transaction log for the portfolio computations.
+
+The accumulators only need the columns below, so they are selected as plain
+rows (attribute access like Transaction, no ORM identity map, UUID parsing or
+unused columns) in the order the accumulators expect. With the covering index
+``ix_transaction_ledger`` Postgres answers these queries with an index-only scan.
+"""
+
+from sqlmodel import select
+
+from app.domain.models import Transaction
+
+LEDGER_COLUMNS = (
+    Transaction.asset_id,
+    Transaction.asset_name,
+    Transaction.asset_type,
+    Transaction.operation_type,
+    Transaction.quantity,
+    Transaction.price,
+    Transaction.currency,
+    Transaction.trade_date,
+)
+
+
+def select_ledger(portfolio_id: str):
+    """Rows of one portfolio ordered by (trade_date, seq); add filters with ``.where``."""
+    return (
+        select(*LEDGER_COLUMNS)
+        .where(Transaction.portfolio_id == portfolio_id)
+        .order_by(Transaction.trade_date, Transaction.seq)
+    )
@@ -0,0 +1,167 @@
+"""Lot accounting: matches sells against open lots to compute realized P&L.
+
+Open lots of each (asset_id, currency) live in a deque: FIFO consumes from
+the left, LIFO from the right and weighted average keeps a single pooled lot,
+so matching is amortized O(1) per trade (each lot is opened and closed once).
+Quantities are signed: a SELL with no open long lots opens a short lot that
+later BUYs close, which keeps backdated histories consistent.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from enum import Enum
+from typing import Iterable
+
+from app.domain.models import OperationType, Transaction
+
+
+class CostMethod(str, Enum):
+    FIFO = "fifo"
+    LIFO = "lifo"
+    AVERAGE = "average"
+
+
+@dataclass(slots=True)
+class Lot:
+    quantity: float  # negative for short lots
+    price: float
+    open_date: date
+
+
+@dataclass(slots=True)
+class ClosedLot:
+    asset_id: str
+    currency: str
+    quantity: float  # negative when a short lot was closed
+    open_date: date
+    close_date: date
+    cost_price: float
+    close_price: float
+    realized_pl: float
+
+
+@dataclass
+class LotPosition:
+    asset_id: str
+    currency: str
+    open_lots: deque[Lot] = field(default_factory=deque)
+    realized_pl: float = 0.0
+
+    @property
+    def quantity(self) -> float:
+        return sum(lot.quantity for lot in self.open_lots)
+
+    @property
+    def cost_basis(self) -> float:
+        return sum(lot.quantity * lot.price for lot in self.open_lots)
+
+
+@dataclass
+class ClosedLotWindow:
+    """Keeps the closed lots with close_date in [start, end], after skipping `offset`, at most `limit`."""
+
+    start: date | None = None
+    end: date | None = None
+    offset: int = 0
+    limit: int | None = None
+    lots: list[ClosedLot] = field(default_factory=list)
+    has_more: bool = False
+    _matched: int = 0
+
+    def append(self, lot: ClosedLot) -> None:
+        if (self.start and lot.close_date < self.start) or (self.end and lot.close_date > self.end):
+            return
+        self._matched += 1
+        if self._matched <= self.offset:
+            return
+        if self.limit is not None and len(self.lots) >= self.limit:
+            self.has_more = True
+            return
+        self.lots.append(lot)
+
+
+@dataclass
+class RealizedReport:
+    method: CostMethod
+    positions: list[LotPosition]
+    closed_lots: list[ClosedLot]
+    has_more_closed_lots: bool = False
+
+    @property
+    def total_realized_pl(self) -> float:
+        return sum(position.realized_pl for position in self.positions)
+
+
+def match_lots(
+    transactions: Iterable[Transaction], method: CostMethod, window: ClosedLotWindow | None = None
+) -> RealizedReport:
+    """Replay trades (ordered by trade_date) and match them into closed lots.
+
+    Every trade is replayed, but only the closed lots inside `window` are kept
+    (all of them when no window is given).
+    """
+    positions: dict[tuple[str, str], LotPosition] = {}
+    closed = window or ClosedLotWindow()
+    for tx in transactions:
+        key = (tx.asset_id, tx.currency)
+        position = positions.get(key)
+        if position is None:
+            position = positions[key] = LotPosition(asset_id=tx.asset_id, currency=tx.currency)
+        signed_quantity = tx.quantity if tx.operation_type == OperationType.BUY else -tx.quantity
+        _apply(position, signed_quantity, tx.price, tx.trade_date, method, closed)
+    return RealizedReport(
+        method=method,
+        positions=list(positions.values()),
+        closed_lots=closed.lots,
+        has_more_closed_lots=closed.has_more,
+    )
+
+
+def _apply(
+    position: LotPosition,
+    quantity: float,
+    price: float,
+    trade_date: date,
+    method: CostMethod,
+    closed: ClosedLotWindow,
+) -> None:
+    lots = position.open_lots
+    pop_lot = lots.pop if method == CostMethod.LIFO else lots.popleft
+    # Close lots on the other side of the trade until the trade is filled.
+    while quantity and lots and (lots[0].quantity > 0) != (quantity > 0):
+        lot = lots[-1] if method == CostMethod.LIFO else lots[0]
+        matched = min(abs(lot.quantity), abs(quantity))
+        matched_signed = matched if lot.quantity > 0 else -matched
+        realized = matched_signed * (price - lot.price)
+        position.realized_pl += realized
+        closed.append(
+            ClosedLot(
+                asset_id=position.asset_id,
+                currency=position.currency,
+                quantity=matched_signed,
+                open_date=lot.open_date,
+                close_date=trade_date,
+                cost_price=lot.price,
+                close_price=price,
+                realized_pl=realized,
+            )
+        )
+        lot.quantity -= matched_signed
+        quantity += matched_signed
+        if abs(lot.quantity) <= abs(matched_signed) * 1e-12:
+            # Fully consumed (tolerating float residue from partial fills).
+            pop_lot()
+        if abs(quantity) <= matched * 1e-12:
+            quantity = 0.0
+
+    if not quantity:
+        return
+    if method == CostMethod.AVERAGE and lots:
+        # Same side as the pooled lot: fold in at the weighted average price.
+        pooled = lots[0]
+        total = pooled.quantity + quantity
+        pooled.price = (pooled.quantity * pooled.price + quantity * price) / total
+        pooled.quantity = total
+    else:
+        lots.append(Lot(quantity=quantity, price=price, open_date=trade_date))
@@ -1,5 +1,6 @@
-from datetime import date
+from datetime import date, datetime, timezone
 from enum import Enum
+from sqlalchemy import JSON, BigInteger, Column, Index, Sequence
 from sqlmodel import SQLModel, Field
 from uuid import UUID, uuid4
 
@@ -9,8 +10,60 @@ class OperationType(str, Enum):
     SELL = "SELL"
 
 
+class ImportJobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Owner of rows created through the unscoped routes (/transactions, /portfolio, ...).
+DEFAULT_PORTFOLIO_ID = "default"
+
+# Postgres source of Transaction.seq; SQLite uses MAX(seq) + 1 (see TransactionService).
+TRANSACTION_SEQ = Sequence("transaction_seq")
+
+
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        # Per-portfolio access: SELL validation, position rebuilds and replays by asset,
+        # keyset pagination of /portfolios/{id}/transactions, optionally filtered by one column.
+        Index("ix_transaction_portfolio_id_asset_id_trade_date", "portfolio_id", "asset_id", "trade_date"),
+        Index("ix_transaction_portfolio_id_trade_date_id", "portfolio_id", "trade_date", "id"),
+        Index("ix_transaction_portfolio_id_currency_trade_date_id", "portfolio_id", "currency", "trade_date", "id"),
+        Index(
+            "ix_transaction_portfolio_id_operation_type_trade_date_id",
+            "portfolio_id",
+            "operation_type",
+            "trade_date",
+            "id",
+        ),
+        # Covering index of the ledger reads (app/domain/ledger.py): index-only scans on Postgres.
+        Index(
+            "ix_transaction_ledger",
+            "portfolio_id",
+            "trade_date",
+            "seq",
+            postgresql_include=[
+                "asset_id",
+                "asset_name",
+                "asset_type",
+                "operation_type",
+                "quantity",
+                "price",
+                "currency",
+            ],
+        ),
+        # Idempotency keys are scoped to their portfolio.
+        Index("uq_transaction_portfolio_id_idempotency_key", "portfolio_id", "idempotency_key", unique=True),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
+    portfolio_id: str = Field(default=DEFAULT_PORTFOLIO_ID)
     asset_id: str
     asset_name: str | None = Field(default=None, nullable=True)
     asset_type: str | None = Field(default=None, nullable=True)
@@ -19,4 +72,87 @@ class Transaction(SQLModel, table=True):
     price: float
     currency: str
     trade_date: date
-    idempotency_key: str | None = Field(default=None, index=True, unique=True, nullable=True)
+    idempotency_key: str | None = Field(default=None, nullable=True)
+    # Monotonic insertion order of the log (UUIDs don't sort); checkpoints record the last one applied.
+    seq: int | None = Field(default=None, sa_column=Column(BigInteger, TRANSACTION_SEQ, unique=True))
+
+
+class Position(SQLModel, table=True):
+    # Projection of the transaction log, one row per (portfolio_id, asset_id, currency).
+    # Kept up to date by TransactionService so portfolio reads don't replay history.
+    portfolio_id: str = Field(default=DEFAULT_PORTFOLIO_ID, primary_key=True)
+    asset_id: str = Field(primary_key=True)
+    currency: str = Field(primary_key=True)
+    asset_name: str
+    asset_type: str
+    quantity: float = 0.0
+    invested: float = 0.0
+    last_price: float = 0.0
+    last_trade_date: date
+
+
+class Price(SQLModel, table=True):
+    # Daily market close per (asset_id, currency); holdings are valued at the latest one.
+    asset_id: str = Field(primary_key=True)
+    currency: str = Field(primary_key=True)
+    price_date: date = Field(primary_key=True)
+    close: float
+
+
+class FxRate(SQLModel, table=True):
+    # Daily rate of `currency` against the pivot currency (USD): 1 unit of currency = rate USD.
+    __tablename__ = "fx_rate"
+
+    currency: str = Field(primary_key=True)
+    rate_date: date = Field(primary_key=True)
+    rate: float
+
+
+class ImportJob(SQLModel, table=True):
+    __tablename__ = "import_job"
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    portfolio_id: str = Field(default=DEFAULT_PORTFOLIO_ID)
+    status: ImportJobStatus = Field(default=ImportJobStatus.PENDING, index=True)
+    # Worker currently processing the job; its lease is renewed with updated_at.
+    owner: str | None = Field(default=None, nullable=True)
+    file_name: str | None = Field(default=None, nullable=True)
+    file_path: str
+    batch_size: int
+    # Progress up to the last committed batch; a resumed job skips rows_processed rows.
+    rows_processed: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    # First IMPORT_JOB_MAX_ERRORS errors only; error_count counts all of them.
+    errors: list[dict] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    error_count: int = 0
+    message: str | None = Field(default=None, nullable=True)
+    created_at: datetime = Field(default_factory=utcnow)
+    started_at: datetime | None = Field(default=None, nullable=True)
+    updated_at: datetime = Field(default_factory=utcnow)
+    finished_at: datetime | None = Field(default=None, nullable=True)
+
+
+class OutboxEvent(SQLModel, table=True):
+    # Events written in the same DB transaction as the change they describe;
+    # the outbox relay forwards them to the broker and deletes them.
+    __tablename__ = "outbox_event"
+
+    id: int | None = Field(default=None, primary_key=True)
+    name: str
+    payload: dict = Field(sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(default_factory=utcnow)
+
+
+class PortfolioCheckpoint(SQLModel, table=True):
+    # Serialized accumulator state (see `app/domain/checkpoints.py`) after every
+    # transaction with seq <= this seq has been applied.
+    __tablename__ = "portfolio_checkpoint"
+
+    __table_args__ = (Index("ix_portfolio_checkpoint_portfolio_id_seq", "portfolio_id", "seq"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    portfolio_id: str = Field(default=DEFAULT_PORTFOLIO_ID)
+    seq: int = Field(sa_column=Column(BigInteger, nullable=False))
+    state: list[dict] = Field(sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(default_factory=utcnow)
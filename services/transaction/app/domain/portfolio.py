@@ -1,5 +1,6 @@
 from collections import defaultdict
 from dataclasses import dataclass
+from typing import Iterable
 
 from app.domain.models import OperationType, Transaction
 
@@ -44,35 +45,62 @@ class PortfolioSnapshot:
 
 
 def build_portfolio_snapshot(transactions: list[Transaction]) -> PortfolioSnapshot:
-    per_asset: dict[tuple[str, str], dict] = {}
-    transactions_sorted = sorted(transactions, key=lambda tx: tx.trade_date)
+    return build_snapshot_from_entries(accumulate_positions(transactions).values())
 
-    for tx in transactions_sorted:
-        key = (tx.asset_id, tx.currency)
-        entry = per_asset.setdefault(
-            key,
-            {
-                "asset_id": tx.asset_id,
-                "asset_name": tx.asset_name or "Unknown Asset",
-                "asset_type": tx.asset_type or "UNKNOWN",
-                "currency": tx.currency,
-                "quantity": 0.0,
-                "invested": 0.0,
-                "last_price": 0.0,
-            },
-        )
-        if tx.asset_name:
-            entry["asset_name"] = tx.asset_name
-        if tx.asset_type:
-            entry["asset_type"] = tx.asset_type
 
-        multiplier = 1.0 if tx.operation_type == OperationType.BUY else -1.0
-        entry["quantity"] += multiplier * tx.quantity
-        entry["invested"] += multiplier * tx.quantity * tx.price
-        entry["last_price"] = tx.price
+def accumulate_positions(transactions: list[Transaction]) -> dict[tuple[str, str], dict]:
+    transactions_sorted = sorted(transactions, key=lambda tx: tx.trade_date)
+    return fold_transactions({}, transactions_sorted)
+
 
+def fold_transactions(
+    per_asset: dict[tuple[str, str], dict], transactions: Iterable[Transaction]
+) -> dict[tuple[str, str], dict]:
+    # `transactions` must already be ordered by trade_date.
+    for tx in transactions:
+        key = (tx.asset_id, tx.currency)
+        entry = per_asset.get(key)
+        if entry is None:
+            entry = per_asset[key] = new_position_entry(tx)
+        apply_to_entry(entry, tx)
+
+    return per_asset
+
+
+def new_position_entry(tx: Transaction) -> dict:
+    return {
+        "asset_id": tx.asset_id,
+        "asset_name": tx.asset_name or "Unknown Asset",
+        "asset_type": tx.asset_type or "UNKNOWN",
+        "currency": tx.currency,
+        "quantity": 0.0,
+        "invested": 0.0,
+        "last_price": 0.0,
+        "last_trade_date": tx.trade_date,
+    }
+
+
+def apply_to_entry(entry: dict, tx: Transaction) -> None:
+    # Transactions must be applied in trade_date order: last_price and the
+    # asset metadata follow the most recent trade.
+    if tx.asset_name:
+        entry["asset_name"] = tx.asset_name
+    if tx.asset_type:
+        entry["asset_type"] = tx.asset_type
+
+    multiplier = 1.0 if tx.operation_type == OperationType.BUY else -1.0
+    entry["quantity"] += multiplier * tx.quantity
+    # Net cash flow, not a cost basis: a SELL removes its proceeds. Kept additive on
+    # purpose (SQL GROUP BY, columnar sums, projection, checkpoints); lot cost
+    # basis and realized P&L come from app.domain.lots (/portfolio/realized).
+    entry["invested"] += multiplier * tx.quantity * tx.price
+    entry["last_price"] = tx.price
+    entry["last_trade_date"] = tx.trade_date
+
+
+def build_snapshot_from_entries(entries: Iterable[dict]) -> PortfolioSnapshot:
     holdings: list[Holding] = []
-    for entry in per_asset.values():
+    for entry in entries:
         quantity = entry["quantity"]
         if quantity <= 0:
             continue
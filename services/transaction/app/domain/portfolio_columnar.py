@@ -0,0 +1,127 @@
+"""Columnar (NumPy) variant of the portfolio accumulation in `portfolio.py`.
+
+Produces the same per-asset entries as `accumulate_positions`, so both engines
+share `build_snapshot_from_entries` for rounding and allocation. Requires the
+optional `numpy` dependency.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from operator import attrgetter
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from app.domain.models import OperationType
+from app.domain.portfolio import PortfolioSnapshot, build_snapshot_from_entries
+
+
+@dataclass
+class TransactionColumns:
+    keys: list[tuple[str, str]]  # (asset_id, currency) for each key code
+    key_codes: np.ndarray  # int64, one per transaction
+    signed_quantity: np.ndarray  # float64, negative for SELL
+    price: np.ndarray  # float64
+    trade_date: np.ndarray  # int64 proleptic ordinals
+    asset_name: np.ndarray  # object, None when missing
+    asset_type: np.ndarray  # object, None when missing
+
+
+def columns_from_rows(rows: Iterable) -> TransactionColumns:
+    """Build columns from objects/rows exposing the Transaction attribute names.
+
+    Each column is filled by one `np.fromiter` pass over the rows (C-level
+    attribute fetch, no per-row Python bytecode); (asset_id, currency) is
+    dictionary-encoded in order of first appearance.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    count = len(rows)
+    key_index: dict[tuple[str, str], int] = {}
+    key_codes = np.fromiter(
+        map(key_index.setdefault, map(attrgetter("asset_id", "currency"), rows), _next_code(key_index)),
+        dtype=np.int64,
+        count=count,
+    )
+    quantity = _float_column(rows, "quantity", count)
+    buy = np.fromiter(map(OperationType.BUY.__eq__, map(attrgetter("operation_type"), rows)), dtype=bool, count=count)
+    return TransactionColumns(
+        keys=list(key_index),
+        key_codes=key_codes,
+        signed_quantity=np.where(buy, quantity, -quantity),
+        price=_float_column(rows, "price", count),
+        trade_date=np.fromiter(map(date.toordinal, map(attrgetter("trade_date"), rows)), dtype=np.int64, count=count),
+        asset_name=_optional_text_column(rows, "asset_name"),
+        asset_type=_optional_text_column(rows, "asset_type"),
+    )
+
+
+def _next_code(key_index: dict) -> Iterator[int]:
+    # Paired with each row's key: the code a key gets if it is new, i.e. len(key_index).
+    while True:
+        yield len(key_index)
+
+
+def _float_column(rows: list, name: str, count: int) -> np.ndarray:
+    return np.fromiter(map(attrgetter(name), rows), dtype=np.float64, count=count)
+
+
+def _optional_text_column(rows: list, name: str) -> np.ndarray:
+    # Empty strings count as missing, like `value or None` in the Python engine.
+    column = np.array(list(map(attrgetter(name), rows)), dtype=object)
+    column[column == ""] = None
+    return column
+
+
+def build_portfolio_snapshot_columnar(columns: TransactionColumns) -> PortfolioSnapshot:
+    return build_snapshot_from_entries(accumulate_columns(columns).values())
+
+
+def accumulate_columns(columns: TransactionColumns) -> dict[tuple[str, str], dict]:
+    n_keys = len(columns.keys)
+    if n_keys == 0:
+        return {}
+
+    # Stable sort matches `sorted(..., key=trade_date)` in the Python engine.
+    order = np.argsort(columns.trade_date, kind="stable")
+    codes = columns.key_codes[order]
+    signed_quantity = columns.signed_quantity[order]
+    price = columns.price[order]
+
+    # bincount adds the weights in array order, i.e. the same sequence of float
+    # additions as the Python loop, so the sums are bit-for-bit identical.
+    quantity = np.bincount(codes, weights=signed_quantity, minlength=n_keys)
+    invested = np.bincount(codes, weights=signed_quantity * price, minlength=n_keys)
+
+    last_index = _last_index_per_key(codes, np.ones(len(codes), dtype=bool), n_keys)
+    last_price = price[last_index]
+    last_trade_date = columns.trade_date[order][last_index]
+    asset_name = _last_non_null(columns.asset_name[order], codes, n_keys, "Unknown Asset")
+    asset_type = _last_non_null(columns.asset_type[order], codes, n_keys, "UNKNOWN")
+
+    per_asset: dict[tuple[str, str], dict] = {}
+    for code, (asset_id, currency) in enumerate(columns.keys):
+        per_asset[(asset_id, currency)] = {
+            "asset_id": asset_id,
+            "asset_name": asset_name[code],
+            "asset_type": asset_type[code],
+            "currency": currency,
+            "quantity": float(quantity[code]),
+            "invested": float(invested[code]),
+            "last_price": float(last_price[code]),
+            "last_trade_date": date.fromordinal(int(last_trade_date[code])),
+        }
+    return per_asset
+
+
+def _last_index_per_key(codes: np.ndarray, mask: np.ndarray, n_keys: int) -> np.ndarray:
+    # Position of the last masked element of each key (-1 when none).
+    last = np.full(n_keys, -1, dtype=np.int64)
+    positions = np.flatnonzero(mask)
+    np.maximum.at(last, codes[positions], positions)
+    return last
+
+
+def _last_non_null(values: np.ndarray, codes: np.ndarray, n_keys: int, default: str) -> list[str]:
+    mask = np.not_equal(values, None)
+    last = _last_index_per_key(codes, mask, n_keys)
+    return [values[index] if index >= 0 else default for index in last]
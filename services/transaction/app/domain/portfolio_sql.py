@@ -0,0 +1,72 @@
+"""SQL variant of the portfolio accumulation in `portfolio.py`.
+
+The database returns one row per (asset_id, currency): signed quantity and
+notional sums, the latest trade date and price, and the latest non-empty
+asset name/type, so only the holdings cross the wire. "Latest" is ranked
+with ROW_NUMBER() over (trade_date, seq) in the same scan as the sums, which
+works on Postgres and SQLite >= 3.25. Produces the same entries as
+`accumulate_positions`, up to floating point summation order.
+"""
+
+from sqlalchemy import and_, case, func, select
+from sqlmodel import Session
+
+from app.domain.models import OperationType, Transaction
+
+KEY_COLUMNS = (Transaction.asset_id, Transaction.currency)
+LATEST_FIRST = (Transaction.trade_date.desc(), Transaction.seq.desc())
+
+
+def aggregate_entries(session: Session, portfolio_id: str) -> list[dict]:
+    ranked = (
+        select(
+            *KEY_COLUMNS,
+            Transaction.trade_date,
+            Transaction.price,
+            Transaction.asset_name,
+            Transaction.asset_type,
+            case(
+                (Transaction.operation_type == OperationType.BUY, Transaction.quantity),
+                else_=-Transaction.quantity,
+            ).label("signed_quantity"),
+            _rank().label("trade_rank"),
+            # Ranked among the trades that carry the attribute, like apply_to_entry skipping blanks.
+            _rank(_present(Transaction.asset_name)).label("name_rank"),
+            _rank(_present(Transaction.asset_type)).label("type_rank"),
+        )
+        .where(Transaction.portfolio_id == portfolio_id)
+        .subquery("ranked")
+    )
+    row = ranked.c
+    stmt = select(
+        row.asset_id,
+        row.currency,
+        func.sum(row.signed_quantity).label("quantity"),
+        func.sum(row.signed_quantity * row.price).label("invested"),
+        func.max(row.trade_date).label("last_trade_date"),
+        func.max(case((row.trade_rank == 1, row.price))).label("last_price"),
+        func.max(case((and_(row.name_rank == 1, _present(row.asset_name)), row.asset_name))).label("asset_name"),
+        func.max(case((and_(row.type_rank == 1, _present(row.asset_type)), row.asset_type))).label("asset_type"),
+    ).group_by(row.asset_id, row.currency)
+
+    return [
+        {
+            "asset_id": result.asset_id,
+            "asset_name": result.asset_name or "Unknown Asset",
+            "asset_type": result.asset_type or "UNKNOWN",
+            "currency": result.currency,
+            "quantity": result.quantity,
+            "invested": result.invested,
+            "last_price": result.last_price,
+            "last_trade_date": result.last_trade_date,
+        }
+        for result in session.execute(stmt)
+    ]
+
+
+def _rank(*partition):
+    return func.row_number().over(partition_by=(*KEY_COLUMNS, *partition), order_by=LATEST_FIRST)
+
+
+def _present(column):
+    return and_(column.is_not(None), column != "")
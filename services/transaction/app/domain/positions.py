@@ -0,0 +1,97 @@
+from collections import defaultdict
+from itertools import groupby
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.domain.ledger import LEDGER_COLUMNS, select_ledger
+from app.domain.models import Position, Transaction
+from app.domain.portfolio import apply_to_entry, fold_transactions
+
+REBUILD_BATCH_SIZE = 10_000
+
+
+def apply_transaction(session: Session, transaction: Transaction) -> None:
+    apply_transactions(session, [transaction])
+
+
+def apply_transactions(session: Session, transactions: list[Transaction]) -> None:
+    # Transactions must already be flushed/inserted: backdated trades rebuild
+    # the affected position from the log, which has to include them. Callers
+    # hold the asset locks (TransactionService._lock_assets), so the rows read
+    # here can't be updated or first inserted by a concurrent writer.
+    by_key: dict[tuple[str, str, str], list[Transaction]] = defaultdict(list)
+    for tx in transactions:
+        by_key[(tx.portfolio_id, tx.asset_id, tx.currency)].append(tx)
+
+    existing = {
+        (position.portfolio_id, position.asset_id, position.currency): position
+        for position in session.exec(
+            select(Position).where(
+                Position.portfolio_id.in_({portfolio_id for portfolio_id, _, _ in by_key}),
+                Position.asset_id.in_({asset_id for _, asset_id, _ in by_key}),
+            )
+        )
+    }
+
+    for key, txs in by_key.items():
+        portfolio_id, asset_id, currency = key
+        txs.sort(key=lambda tx: tx.trade_date)
+        position = existing.get(key)
+        if position is None:
+            entry = fold_transactions({}, txs)[(asset_id, currency)]
+            session.add(Position(portfolio_id=portfolio_id, **entry))
+        elif txs[0].trade_date < position.last_trade_date:
+            # A backdated trade changes which price/metadata is the most recent:
+            # recompute this single position from its own history.
+            rebuild_position(session, *key)
+        else:
+            entry = position.model_dump()
+            for tx in txs:
+                apply_to_entry(entry, tx)
+            position.sqlmodel_update(entry)
+            session.add(position)
+
+
+def rebuild_position(session: Session, portfolio_id: str, asset_id: str, currency: str) -> Position | None:
+    transactions = session.exec(
+        select_ledger(portfolio_id).where(Transaction.asset_id == asset_id, Transaction.currency == currency)
+    )
+    entry = fold_transactions({}, transactions).get((asset_id, currency))
+
+    position = session.get(Position, (portfolio_id, asset_id, currency))
+    if entry is None:
+        if position is not None:
+            session.delete(position)
+        return None
+    if position is None:
+        position = Position(portfolio_id=portfolio_id, **entry)
+    else:
+        position.sqlmodel_update(entry)
+    session.add(position)
+    return position
+
+
+def rebuild_positions(session: Session) -> int:
+    """Recompute the whole projection from the transaction log and commit it."""
+    stmt = (
+        select(Transaction.portfolio_id, *LEDGER_COLUMNS)
+        .order_by(Transaction.portfolio_id, Transaction.trade_date, Transaction.seq)
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    rows: list[Position] = []
+    for portfolio_id, transactions in groupby(session.exec(stmt), key=lambda tx: tx.portfolio_id):
+        per_asset = fold_transactions({}, transactions)
+        rows.extend(Position(portfolio_id=portfolio_id, **entry) for entry in per_asset.values())
+
+    session.execute(delete(Position))
+    session.add_all(rows)
+    session.commit()
+    return len(rows)
+
+
+def list_positions(session: Session, portfolio_id: str) -> list[dict]:
+    return [
+        position.model_dump()
+        for position in session.exec(select(Position).where(Position.portfolio_id == portfolio_id)).all()
+    ]
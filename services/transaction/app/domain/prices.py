@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import and_, func
+from sqlmodel import Session, select
+
+from app.core import outbox
+from app.core.config import get_settings
+from app.core.database import upsert_rows
+from app.core.events import PRICES_UPDATED, DomainEvent, event_bus
+from app.domain.models import Price
+
+PriceKey = tuple[str, str]  # (asset_id, currency)
+
+
+class PriceService:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def upsert_prices(self, prices: list[Price]) -> int:
+        """Insert or overwrite closes and commit; returns the number of distinct rows written."""
+        # Last row wins for a repeated (asset_id, currency, date), as with consecutive upserts.
+        rows = {
+            (price.asset_id, price.currency, price.price_date): price.model_dump() for price in prices
+        }
+        if not rows:
+            return 0
+        upsert_rows(self.session, Price, list(rows.values()), ["asset_id", "currency", "price_date"])
+
+        keys = sorted({(asset_id, currency) for asset_id, currency, _ in rows})
+        event = DomainEvent(name=PRICES_UPDATED, payload={"keys": [list(key) for key in keys]})
+        outbox.stage_events(self.session, [event])
+        self.session.commit()
+        event_bus.publish(event)
+        return len(rows)
+
+
+class LatestPriceCache:
+    """Process-local LRU of the latest close per (asset_id, currency).
+
+    Misses are resolved for all requested keys with one query; keys without
+    any price are cached too, so unpriced holdings don't hit the DB each time.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._generation = 0
+        self._entries: OrderedDict[PriceKey, tuple[date, float] | None] = OrderedDict()
+
+    def get_many(self, session: Session, keys: Iterable[PriceKey]) -> dict[PriceKey, tuple[date, float]]:
+        found: dict[PriceKey, tuple[date, float] | None] = {}
+        missing: set[PriceKey] = set()
+        with self._lock:
+            generation = self._generation
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                else:
+                    missing.add(key)
+
+        if missing:
+            fetched = dict.fromkeys(missing)
+            fetched.update(_latest_prices(session, {asset_id for asset_id, _ in missing}))
+            with self._lock:
+                # Skip the fill if prices were ingested while querying: the rows may predate them.
+                if generation == self._generation:
+                    for key, value in fetched.items():
+                        self._entries[key] = value
+                        self._entries.move_to_end(key)
+                    while len(self._entries) > self._max_entries:
+                        self._entries.popitem(last=False)
+            found.update((key, fetched[key]) for key in missing)
+        return {key: value for key, value in found.items() if value is not None}
+
+    def invalidate(self, event: DomainEvent | None = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if event is None:
+                self._entries.clear()
+                return
+            for asset_id, currency in event.payload["keys"]:
+                self._entries.pop((asset_id, currency), None)
+
+
+def apply_marks(session: Session, entries: Iterable[dict]) -> list[dict]:
+    """Value entries at the latest market close when it is at least as recent as their last trade."""
+    entries = list(entries)
+    marks = latest_prices.get_many(
+        session, {(entry["asset_id"], entry["currency"]) for entry in entries if entry["quantity"] > 0}
+    )
+    marked = []
+    for entry in entries:
+        mark = marks.get((entry["asset_id"], entry["currency"]))
+        if mark is not None and mark[0] >= entry["last_trade_date"]:
+            entry = {**entry, "last_price": mark[1]}
+        marked.append(entry)
+    return marked
+
+
+def _latest_prices(session: Session, asset_ids: set[str]) -> dict[PriceKey, tuple[date, float]]:
+    latest = (
+        select(Price.asset_id, Price.currency, func.max(Price.price_date).label("price_date"))
+        .where(Price.asset_id.in_(asset_ids))
+        .group_by(Price.asset_id, Price.currency)
+        .subquery()
+    )
+    rows = session.exec(
+        select(Price.asset_id, Price.currency, Price.price_date, Price.close).join(
+            latest,
+            and_(
+                Price.asset_id == latest.c.asset_id,
+                Price.currency == latest.c.currency,
+                Price.price_date == latest.c.price_date,
+            ),
+        )
+    )
+    return {(asset_id, currency): (price_date, close) for asset_id, currency, price_date, close in rows}
+
+
+latest_prices = LatestPriceCache(max_entries=get_settings().price_cache_size)
+event_bus.subscribe(PRICES_UPDATED, latest_prices.invalidate)
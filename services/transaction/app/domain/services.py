@@ -1,64 +1,236 @@
+from dataclasses import dataclass
 from datetime import date
 from uuid import UUID
+from sqlalchemy import case, func, insert
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.domain.models import Transaction, OperationType
-from app.core.events import publish_transaction_created, publish_transaction_deleted
+from app.domain import checkpoints, positions
+from app.domain.idempotency import idempotency_index
+from app.domain.models import DEFAULT_PORTFOLIO_ID, TRANSACTION_SEQ, Transaction, OperationType
+from app.core import outbox
+from app.core.config import get_settings
+from app.core.events import TRANSACTION_CREATED, TRANSACTION_DELETED, DomainEvent, event_bus
 
-ALLOWED_CURRENCIES = {"USD", "EUR", "GBP"}
+ALLOWED_CURRENCIES = frozenset(get_settings().allowed_currencies)
 
 
 class DomainException(Exception):
     pass
 
 
+@dataclass
+class BatchItemResult:
+    status: str  # "created", "duplicate", "rejected" or "aborted" (atomic batch not applied)
+    transaction: Transaction | None = None
+    message: str | None = None
+
+
 class TransactionService:
-    def __init__(self, session: Session):
+    """Rules and writes for the transactions of one portfolio.
+
+    Every query is filtered on ``portfolio_id``, so validation and projection
+    updates only touch that portfolio's rows (and partition, on Postgres).
+    """
+
+    def __init__(self, session: Session, portfolio_id: str = DEFAULT_PORTFOLIO_ID):
         self.session = session
+        self.portfolio_id = portfolio_id
+        # Staged in the outbox with the data, dispatched in-process on commit().
+        self._pending_events: list[DomainEvent] = []
+        # Idempotency keys written in this unit of work, added to the index on commit().
+        self._pending_keys: list[tuple[str, UUID]] = []
 
     def create_transaction(self, transaction: Transaction, idempotency_key: str | None = None) -> Transaction:
         if idempotency_key:
-            existing = self.session.exec(
-                select(Transaction).where(Transaction.idempotency_key == idempotency_key)
-            ).first()
+            existing = self._find_by_idempotency_keys({idempotency_key}).get(idempotency_key)
             if existing:
                 return existing
             transaction.idempotency_key = idempotency_key
 
+        transaction.portfolio_id = self.portfolio_id
         self._validate_basic_rules(transaction)
+        # Held until commit: the position update below is a read-modify-write.
+        self._lock_assets({transaction.asset_id})
         self._validate_sell_quantity(transaction)
 
+        checkpoints.lock_seq(self.session, self.portfolio_id)
+        transaction.seq = self._next_seq()
         self.session.add(transaction)
-        self.session.commit()
+        try:
+            positions.apply_transaction(self.session, transaction)
+            self._stage_events([_created_event(transaction)])
+            if idempotency_key:
+                self._pending_keys.append((idempotency_key, transaction.id))
+            self.commit()
+        except IntegrityError:
+            # The index skipped the SELECT but another request stored the key first.
+            self._rollback()
+            if not idempotency_key:
+                raise
+            existing = self._find_by_idempotency_keys({idempotency_key}, force=True).get(idempotency_key)
+            if existing is None:
+                raise
+            return existing
         self.session.refresh(transaction)
+        return transaction
 
-        publish_transaction_created(
-            {
-                "id": str(transaction.id),
-                "asset_id": transaction.asset_id,
-                "operation_type": transaction.operation_type,
-                "quantity": transaction.quantity,
-                "price": transaction.price,
-                "currency": transaction.currency,
-                "trade_date": transaction.trade_date.isoformat(),
-            }
+    def create_transactions(
+        self, items: list[tuple[Transaction, str | None]], commit: bool = True, atomic: bool = False
+    ) -> list[BatchItemResult]:
+        """Validate and insert a chunk of transactions with one commit.
+
+        Items are processed in order: SELLs are checked against a running
+        position seeded from the database, so a SELL can consume a BUY that
+        appears earlier in the same chunk. With ``commit=False`` the rows are
+        only flushed; the caller finishes the unit of work with ``commit()``.
+        With ``atomic=True`` a single rejected item rejects the whole chunk:
+        nothing is written and the valid items are reported as "aborted".
+        """
+        try:
+            return self._create_transactions(items, commit, atomic, force_lookup=False)
+        except IntegrityError:
+            # A key the index reported as new was stored concurrently: redo the
+            # chunk with every key looked up in the database.
+            self._rollback()
+            return self._create_transactions(items, commit, atomic, force_lookup=True)
+
+    def _create_transactions(
+        self, items: list[tuple[Transaction, str | None]], commit: bool, atomic: bool, force_lookup: bool
+    ) -> list[BatchItemResult]:
+        existing = self._find_by_idempotency_keys({key for _, key in items if key}, force=force_lookup)
+
+        # Every asset of the chunk, BUYs included: SELLs are validated against the
+        # running positions and apply_transactions rewrites the position rows.
+        self._lock_assets({tx.asset_id for tx, _ in items})
+        available = self._seed_available_quantities(
+            {tx.asset_id for tx, _ in items if tx.operation_type == OperationType.SELL}
         )
-        return transaction
+        results: list[BatchItemResult] = []
+        created: list[Transaction] = []
+        for transaction, idempotency_key in items:
+            transaction.portfolio_id = self.portfolio_id
+            if idempotency_key:
+                duplicate = existing.get(idempotency_key)
+                if duplicate is not None:
+                    results.append(BatchItemResult(status="duplicate", transaction=duplicate))
+                    continue
+                transaction.idempotency_key = idempotency_key
+
+            try:
+                self._validate_basic_rules(transaction)
+                if transaction.operation_type == OperationType.SELL:
+                    total_quantity = available.get(transaction.asset_id, 0.0)
+                    if transaction.quantity > total_quantity:
+                        raise DomainException(
+                            f"Cannot sell {transaction.quantity}, only {total_quantity} available"
+                        )
+            except DomainException as exc:
+                results.append(BatchItemResult(status="rejected", message=str(exc)))
+                continue
+
+            multiplier = 1.0 if transaction.operation_type == OperationType.BUY else -1.0
+            if transaction.asset_id in available:
+                available[transaction.asset_id] += multiplier * transaction.quantity
+            if idempotency_key:
+                existing[idempotency_key] = transaction
+                self._pending_keys.append((idempotency_key, transaction.id))
+            created.append(transaction)
+            results.append(BatchItemResult(status="created", transaction=transaction))
+
+        if atomic and any(result.status == "rejected" for result in results):
+            for result in results:
+                if result.status == "created":
+                    result.status, result.transaction = "aborted", None
+            # Drops the advisory locks and the keys staged for the aborted items, so a
+            # later commit() on this service can't publish them to the idempotency index.
+            self._rollback()
+            return results
+
+        if created:
+            checkpoints.lock_seq(self.session, self.portfolio_id)
+            self.session.execute(
+                insert(Transaction).values(seq=self._next_seq()),
+                [tx.model_dump(exclude={"seq"}) for tx in created],
+            )
+            positions.apply_transactions(self.session, created)
+            self._stage_events([_created_event(tx) for tx in created])
+        if commit:
+            self.commit()
+        return results
+
+    def commit(self) -> None:
+        self.session.commit()
+        if self._pending_keys:
+            idempotency_index.remember(self.portfolio_id, self._pending_keys)
+            self._pending_keys = []
+        pending, self._pending_events = self._pending_events, []
+        for event in pending:
+            event_bus.publish(event)
+
+    def _rollback(self) -> None:
+        self.session.rollback()
+        self._pending_events = []
+        self._pending_keys = []
 
     def delete_transaction(self, transaction_id: str | UUID) -> None:
         tx_id = transaction_id if isinstance(transaction_id, UUID) else UUID(str(transaction_id))
-        tx = self.session.get(Transaction, tx_id)
+        tx = self._get(tx_id)
         if tx is None:
             raise DomainException(f"Transaction {tx_id} not found")
+        self._lock_asset(tx.asset_id)
+        if tx.idempotency_key:
+            idempotency_index.forget(tx.portfolio_id, tx.idempotency_key)
         self.session.delete(tx)
-        self.session.commit()
-        publish_transaction_deleted(
-            {
-                "id": str(tx_id),
-                "asset_id": tx.asset_id,
-                "operation_type": tx.operation_type,
-            }
+        positions.rebuild_position(self.session, tx.portfolio_id, tx.asset_id, tx.currency)
+        checkpoints.discard_checkpoints(self.session, tx)
+        self._stage_events(
+            [
+                DomainEvent(
+                    name=TRANSACTION_DELETED,
+                    payload={
+                        "id": str(tx_id),
+                        "portfolio_id": tx.portfolio_id,
+                        "asset_id": tx.asset_id,
+                        "operation_type": tx.operation_type,
+                    },
+                )
+            ]
         )
+        self.commit()
+
+    def _find_by_idempotency_keys(self, keys: set[str], force: bool = False) -> dict[str, Transaction]:
+        """Stored transactions by idempotency key, querying only keys that may exist."""
+        found: dict[str, Transaction] = {}
+        keys = set(keys)
+        if not force:
+            for key in list(keys):
+                tx_id = idempotency_index.lookup(self.portfolio_id, key)
+                # Confirm recent hits: the transaction may have been deleted since.
+                tx = self._get(tx_id) if tx_id is not None else None
+                if tx is not None and tx.idempotency_key == key:
+                    found[key] = tx
+                    keys.discard(key)
+                elif tx_id is not None:
+                    idempotency_index.forget(self.portfolio_id, key)
+            keys = {key for key in keys if idempotency_index.might_exist(self.portfolio_id, key)}
+        if keys:
+            rows = self.session.exec(
+                select(Transaction).where(
+                    Transaction.portfolio_id == self.portfolio_id, Transaction.idempotency_key.in_(keys)
+                )
+            ).all()
+            found.update((tx.idempotency_key, tx) for tx in rows)
+            idempotency_index.remember(self.portfolio_id, [(tx.idempotency_key, tx.id) for tx in rows])
+        return found
+
+    def _get(self, tx_id: UUID) -> Transaction | None:
+        # Filtered on portfolio_id too: on a partitioned table the key is
+        # (portfolio_id, id) and the lookup must prune to one partition.
+        return self.session.exec(
+            select(Transaction).where(Transaction.portfolio_id == self.portfolio_id, Transaction.id == tx_id)
+        ).first()
 
     def _validate_basic_rules(self, transaction: Transaction):
         # Normalize trade_date if it arrives as a string (e.g., from JSON)
@@ -73,6 +245,11 @@ class TransactionService:
         if transaction.asset_type:
             transaction.asset_type = transaction.asset_type.strip().upper()
 
+        try:
+            transaction.operation_type = OperationType(transaction.operation_type)
+        except ValueError:
+            raise DomainException(f"Invalid operation_type: {transaction.operation_type}")
+
         if transaction.quantity <= 0:
             raise DomainException("Quantity must be greater than zero")
 
@@ -90,19 +267,108 @@ class TransactionService:
         if transaction.operation_type != OperationType.SELL:
             return
 
-        result = self.session.exec(
-            select(Transaction)
-            .where(Transaction.asset_id == transaction.asset_id)
-        ).all()
-
-        total_quantity = 0.0
-        for tx in result:
-            if tx.operation_type == OperationType.BUY:
-                total_quantity += tx.quantity
-            else:
-                total_quantity -= tx.quantity
+        total_quantity = self._available_quantity(transaction.asset_id)
 
         if transaction.quantity > total_quantity:
             raise DomainException(
                 f"Cannot sell {transaction.quantity}, only {total_quantity} available"
             )
+
+    def _available_quantity(self, asset_id: str) -> float:
+        return self.session.exec(
+            select(func.coalesce(func.sum(_signed_quantity()), 0.0)).where(
+                Transaction.portfolio_id == self.portfolio_id, Transaction.asset_id == asset_id
+            )
+        ).one()
+
+    def _seed_available_quantities(self, asset_ids: set[str]) -> dict[str, float]:
+        if not asset_ids:
+            return {}
+        rows = self.session.exec(
+            select(Transaction.asset_id, func.sum(_signed_quantity()))
+            .where(Transaction.portfolio_id == self.portfolio_id, Transaction.asset_id.in_(asset_ids))
+            .group_by(Transaction.asset_id)
+        ).all()
+        available = dict.fromkeys(asset_ids, 0.0)
+        available.update({asset_id: quantity for asset_id, quantity in rows})
+        return available
+
+    def _lock_assets(self, asset_ids: set[str]) -> None:
+        for asset_id in sorted(asset_ids):
+            # Sorted to keep lock acquisition order stable across concurrent batches.
+            self._lock_asset(asset_id)
+
+    def _lock_asset(self, asset_id: str) -> None:
+        # Serialize writers of an asset (inserts update its position rows, SELLs
+        # and deletes can reduce the available quantity) until the surrounding
+        # DB transaction ends. SQLite already serializes writers, so only
+        # Postgres needs the lock.
+        if self.session.get_bind().dialect.name == "postgresql":
+            self.session.exec(
+                select(func.pg_advisory_xact_lock(func.hashtext(f"{self.portfolio_id}:{asset_id}")))
+            ).one()
+
+    def _next_seq(self):
+        # Evaluated inside the INSERT, per row, while the caller holds the shared
+        # seq lock (checkpoints rely on it, see checkpoints.lock_seq).
+        if self.session.get_bind().dialect.name == "postgresql":
+            return TRANSACTION_SEQ.next_value()
+        return select(func.coalesce(func.max(Transaction.seq), 0) + 1).scalar_subquery()
+
+    def _stage_events(self, events: list[DomainEvent]) -> None:
+        outbox.stage_events(self.session, events)
+        self._pending_events.extend(events)
+
+
+class AsyncTransactionService:
+    """Async counterpart of TransactionService for AsyncSession-based routes.
+
+    The rules live in TransactionService; ``run_sync`` executes them on the
+    AsyncSession's connection (asyncpg on Postgres) without blocking the
+    event loop or borrowing a threadpool worker.
+    """
+
+    def __init__(self, session: AsyncSession, portfolio_id: str = DEFAULT_PORTFOLIO_ID):
+        self.session = session
+        self.portfolio_id = portfolio_id
+
+    async def create_transaction(self, transaction: Transaction, idempotency_key: str | None = None) -> Transaction:
+        return await self.session.run_sync(
+            lambda session: self._service(session).create_transaction(transaction, idempotency_key)
+        )
+
+    async def create_transactions(
+        self, items: list[tuple[Transaction, str | None]], atomic: bool = False
+    ) -> list[BatchItemResult]:
+        return await self.session.run_sync(
+            lambda session: self._service(session).create_transactions(items, atomic=atomic)
+        )
+
+    async def delete_transaction(self, transaction_id: str | UUID) -> None:
+        await self.session.run_sync(lambda session: self._service(session).delete_transaction(transaction_id))
+
+    def _service(self, session: Session) -> TransactionService:
+        return TransactionService(session, self.portfolio_id)
+
+
+def _created_event(transaction: Transaction) -> DomainEvent:
+    return DomainEvent(
+        name=TRANSACTION_CREATED,
+        payload={
+            "id": str(transaction.id),
+            "portfolio_id": transaction.portfolio_id,
+            "asset_id": transaction.asset_id,
+            "operation_type": transaction.operation_type,
+            "quantity": transaction.quantity,
+            "price": transaction.price,
+            "currency": transaction.currency,
+            "trade_date": transaction.trade_date.isoformat(),
+        },
+    )
+
+
+def _signed_quantity():
+    return case(
+        (Transaction.operation_type == OperationType.BUY, Transaction.quantity),
+        else_=-Transaction.quantity,
+    )
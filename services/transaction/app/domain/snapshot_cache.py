@@ -0,0 +1,73 @@
+import threading
+import time
+import uuid
+from typing import Hashable
+
+from app.core.config import get_settings
+from app.core.events import (
+    FX_RATES_UPDATED,
+    PRICES_UPDATED,
+    TRANSACTION_CREATED,
+    TRANSACTION_DELETED,
+    DomainEvent,
+    event_bus,
+)
+from app.domain.portfolio import PortfolioSnapshot
+
+
+class SnapshotCache:
+    """Process-local cache of computed portfolio snapshots.
+
+    Entries are tagged with a data version that is bumped by the transaction,
+    price and FX events, so a snapshot computed before a write is never served
+    after it.
+    With several worker processes a write is only seen by the process that
+    made it: set ``ttl_seconds`` to bound staleness in that setup.
+    """
+
+    def __init__(self, ttl_seconds: float = 0.0) -> None:
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]  # keeps ETags unique across restarts
+        self._ttl_seconds = ttl_seconds
+        self._version = 0
+        self._version_started = time.monotonic()
+        self._entries: dict[Hashable, tuple[int, PortfolioSnapshot]] = {}
+
+    def version(self) -> int:
+        with self._lock:
+            if self._ttl_seconds and time.monotonic() - self._version_started > self._ttl_seconds:
+                self._bump()
+            return self._version
+
+    def etag(self, key: Hashable, version: int) -> str:
+        # Weak: the same tag is sent gzip-, brotli- or identity-encoded, so the
+        # bytes differ while the representation is equivalent.
+        return f'W/"{self._epoch}-{version}-{uuid.uuid5(uuid.NAMESPACE_OID, repr(key)).hex[:8]}"'
+
+    def get(self, key: Hashable, version: int) -> PortfolioSnapshot | None:
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        return cached[1]
+
+    def put(self, key: Hashable, version: int, snapshot: PortfolioSnapshot) -> None:
+        # `version` is read before computing: if a write landed meanwhile the
+        # entry is already outdated and is simply never returned.
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (version, snapshot)
+
+    def invalidate(self, event: DomainEvent | None = None) -> None:
+        with self._lock:
+            self._bump()
+
+    def _bump(self) -> None:
+        self._version += 1
+        self._version_started = time.monotonic()
+        self._entries.clear()
+
+
+snapshot_cache = SnapshotCache(ttl_seconds=get_settings().snapshot_cache_ttl_seconds)
+for _event_name in (TRANSACTION_CREATED, TRANSACTION_DELETED, PRICES_UPDATED, FX_RATES_UPDATED):
+    event_bus.subscribe(_event_name, snapshot_cache.invalidate)
@@ -2,7 +2,7 @@
 
 import logging
 import os
-import sys
+import random
 import time
 import uuid
 from contextlib import asynccontextmanager
@@ -13,29 +13,66 @@ from fastapi.responses import JSONResponse
 from pythonjsonlogger import jsonlogger
 from sqlmodel import SQLModel
 
-from app.api.imports import router as imports_router
+from app.api.exports import router as exports_router
+from app.api.fx import router as fx_router
+from app.api.imports import ImportJobResumer, router as imports_router
+from app.api.metrics import router as metrics_router
 from app.api.portfolio import router as portfolio_router
+from app.api.prices import router as prices_router
 from app.api.transactions import router as transactions_router
-from app.core.database import engine
-from app.core.errors import NotFoundException
+from app.core.config import get_settings
+from app.core.compression import CompressionMiddleware
+from app.core.database import async_engine, engine
+from app.core.errors import InvalidRequestException, NotFoundException
+from app.core.jobs import job_runner
+from app.core.logs import install_queue_logging
+from app.core.outbox import OutboxRelay, build_broker
+from app.core.profiling import PROFILE_HEADER, profile_request
+from app.core.timing import instrument_sql, observe_request, route_template, start_request
+from app.domain.checkpoints import CheckpointScheduler
+from app.domain.idempotency import idempotency_index
 from app.domain.services import DomainException
 
-handler = logging.StreamHandler(sys.stdout)
 formatter = jsonlogger.JsonFormatter(
     "%(asctime)s %(levelname)s %(name)s %(message)s %(request_id)s %(method)s %(path)s %(status_code)s %(duration_ms)s"
 )
-handler.setFormatter(formatter)
 logger = logging.getLogger("transactions_service")
 logger.setLevel(logging.INFO)
-logger.handlers = [handler]
 logger.propagate = False
+# Records are formatted and written to stdout in batches by a background thread.
+log_listener = install_queue_logging(logger, formatter, get_settings().log_queue_size)
+request_log_sample_rate = get_settings().request_log_sample_rate
+
+instrument_sql()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    log_listener.start()
     # Ensure all SQLModel-defined tables are created before serving requests.
     SQLModel.metadata.create_all(engine)
+    # Until warmed, idempotency keys are always looked up in the database.
+    idempotency_index.start_warming(engine)
+    settings = get_settings()
+    # Interrupted jobs resume once their lease expires, whichever replica claims them first.
+    job_resumer = ImportJobResumer(engine, settings.import_job_lease_seconds)
+    job_resumer.start()
+    broker = build_broker(settings)
+    relay = OutboxRelay(engine, broker) if broker is not None else None
+    if relay is not None:
+        relay.start()
+    scheduler = CheckpointScheduler(engine, settings.checkpoint_every_events)
+    if settings.checkpoint_every_events > 0:
+        scheduler.start()
     yield
+    scheduler.stop()
+    if relay is not None:
+        relay.stop()
+    job_resumer.stop()
+    job_runner.shutdown()
+    await async_engine.dispose()
+    # Last: writes out everything logged during shutdown.
+    log_listener.stop()
 
 
 # Create the ASGI app with a descriptive title for docs/UIs.
@@ -53,27 +90,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Next-Cursor", "ETag", "Server-Timing"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=get_settings().compression_minimum_size)
 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     request_id = str(uuid.uuid4())
     request.state.request_id = request_id
-    start = time.time()
-    response = await call_next(request)
-    duration_ms = (time.time() - start) * 1000
+    timings = start_request()
+    start = time.perf_counter()
+    if PROFILE_HEADER in request.headers and get_settings().profiling_enabled:
+        response = await profile_request(request, call_next)
+    else:
+        response = await call_next(request)
+    duration = time.perf_counter() - start
+    duration_ms = duration * 1000
+    observe_request(request.method, route_template(request.scope), response.status_code, duration, timings)
+    response.headers["Server-Timing"] = timings.server_timing(duration)
     response.headers["X-Request-ID"] = request_id
-    logger.info(
-        "request",
-        extra={
-            "request_id": request_id,
-            "method": request.method,
-            "path": request.url.path,
-            "status_code": response.status_code,
-            "duration_ms": round(duration_ms, 2),
-        },
-    )
+    if response.status_code >= 400 or random.random() < request_log_sample_rate:
+        logger.info(
+            "request",
+            extra={
+                "request_id": request_id,
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "duration_ms": round(duration_ms, 2),
+            },
+        )
     return response
 
 
@@ -103,6 +150,19 @@ async def not_found_exception_handler(request: Request, exc: NotFoundException):
     )
 
 
+@app.exception_handler(InvalidRequestException)
+async def invalid_request_exception_handler(request: Request, exc: InvalidRequestException):
+    request_id = getattr(request.state, "request_id", None)
+    logger.info(
+        "Invalid request",
+        extra={"request_id": request_id, "method": request.method, "path": request.url.path},
+    )
+    return JSONResponse(
+        status_code=400,
+        content={"code": "invalid_request", "message": str(exc)},
+    )
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
     request_id = getattr(request.state, "request_id", None)
@@ -117,6 +177,14 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
 
 
 # Mount the transactions API routes under their configured prefix.
-app.include_router(transactions_router)
-app.include_router(imports_router)
-app.include_router(portfolio_router)
+# Portfolio-scoped data is served at the root for the default portfolio and
+# under /portfolios/{portfolio_id} for every other account.
+for _prefix in ("", "/portfolios/{portfolio_id}"):
+    app.include_router(transactions_router, prefix=_prefix)
+    app.include_router(imports_router, prefix=_prefix)
+    app.include_router(exports_router, prefix=_prefix)
+app.include_router(portfolio_router, prefix="/portfolio")
+app.include_router(portfolio_router, prefix="/portfolios/{portfolio_id}")
+app.include_router(prices_router)
+app.include_router(fx_router)
+app.include_router(metrics_router)
@@ -0,0 +1,49 @@
+"""Time the lot-matching engine (FIFO, LIFO, average) on synthetic histories.
+
+Run from services/transaction:
+
+    python -m benchmarks.bench_lot_engine --sizes 10000 1000000
+"""
+
+import argparse
+import json
+import time
+
+from app.domain.lots import CostMethod, match_lots
+from benchmarks.synthetic import generate_transactions
+
+DEFAULT_SIZES = (10_000, 1_000_000)
+
+
+def run(sizes) -> list[dict]:
+    results = []
+    for size in sizes:
+        transactions = sorted(generate_transactions(size), key=lambda tx: tx.trade_date)
+        for method in CostMethod:
+            start = time.perf_counter()
+            report = match_lots(transactions, method)
+            elapsed = time.perf_counter() - start
+            results.append(
+                {
+                    "transactions": size,
+                    "method": method.value,
+                    "seconds": round(elapsed, 4),
+                    "trades_per_second": round(size / elapsed) if elapsed else None,
+                    "closed_lots": len(report.closed_lots),
+                    "open_lots": sum(len(position.open_lots) for position in report.positions),
+                }
+            )
+            print(json.dumps(results[-1]), flush=True)
+        del transactions
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
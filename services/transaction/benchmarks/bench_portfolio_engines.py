@@ -0,0 +1,60 @@
+"""Compare the Python and NumPy portfolio engines on synthetic histories.
+
+Run from services/transaction:
+
+    python -m benchmarks.bench_portfolio_engines --sizes 10000 1000000 10000000
+
+10M transactions need several GB of RAM for the Python objects.
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict
+
+from app.domain.portfolio import build_portfolio_snapshot
+from app.domain.portfolio_columnar import build_portfolio_snapshot_columnar, columns_from_rows
+from benchmarks.synthetic import generate_transactions
+
+DEFAULT_SIZES = (10_000, 1_000_000, 10_000_000)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(sizes) -> list[dict]:
+    results = []
+    for size in sizes:
+        transactions = generate_transactions(size)
+        python_snapshot, python_s = _timed(build_portfolio_snapshot, transactions)
+        columns, load_s = _timed(columns_from_rows, transactions)
+        columnar_snapshot, columnar_s = _timed(build_portfolio_snapshot_columnar, columns)
+        results.append(
+            {
+                "transactions": size,
+                "python_s": round(python_s, 4),
+                "columnar_load_s": round(load_s, 4),
+                "columnar_compute_s": round(columnar_s, 4),
+                "columnar_total_s": round(load_s + columnar_s, 4),
+                # Headline: both engines start from the same rows, so loading counts.
+                "speedup": round(python_s / (load_s + columnar_s), 1),
+                "identical": asdict(python_snapshot) == asdict(columnar_snapshot),
+            }
+        )
+        print(json.dumps(results[-1]), flush=True)
+        del transactions, columns
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    args = parser.parse_args()
+    run(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare two bench_service reports and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits with status 1 when any metric is worse than the baseline by more than
+``--threshold`` percent (latencies and durations up, rates down).
+"""
+
+import argparse
+import json
+import sys
+
+# Metrics where a higher value is worse; every other numeric metric is a rate.
+LOWER_IS_BETTER = ("p50_ms", "p99_ms", "seconds")
+COMPARED = (*LOWER_IS_BETTER, "rows_per_second")
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[dict]:
+    previous = {(r["benchmark"], r["transactions"]): r for r in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        before = previous.get((result["benchmark"], result["transactions"]))
+        if before is None:
+            continue
+        for metric in COMPARED:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = change if metric in LOWER_IS_BETTER else -change
+            rows.append(
+                {
+                    "benchmark": result["benchmark"],
+                    "transactions": result["transactions"],
+                    "metric": metric,
+                    "baseline": old,
+                    "candidate": new,
+                    "change_pct": round(change, 1),
+                    "regression": worse > threshold,
+                }
+            )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    with open(args.candidate, encoding="utf-8") as fh:
+        candidate = json.load(fh)
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        print(json.dumps(row))
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
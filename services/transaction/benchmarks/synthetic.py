@@ -0,0 +1,43 @@
+"""Deterministic synthetic transaction histories for the benchmarks."""
+
+import random
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from app.domain.models import OperationType
+
+START_DATE = date(2015, 1, 1)
+CURRENCIES = ("USD", "EUR", "GBP")
+ASSET_TYPES = ("ETF", "STOCK", "BOND", "CRYPTO")
+
+
+class SyntheticTransaction(NamedTuple):
+    asset_id: str
+    asset_name: str | None
+    asset_type: str | None
+    operation_type: OperationType
+    quantity: float
+    price: float
+    currency: str
+    trade_date: date
+
+
+def generate_transactions(count: int, assets: int = 500, seed: int = 42) -> list[SyntheticTransaction]:
+    rng = random.Random(seed)
+    days = [START_DATE + timedelta(days=offset) for offset in range(3650)]
+    transactions = []
+    for _ in range(count):
+        asset = rng.randrange(assets)
+        transactions.append(
+            SyntheticTransaction(
+                asset_id=f"ASSET{asset:05d}",
+                asset_name=f"Asset {asset}" if rng.random() < 0.5 else None,
+                asset_type=ASSET_TYPES[asset % len(ASSET_TYPES)],
+                operation_type=OperationType.BUY if rng.random() < 0.7 else OperationType.SELL,
+                quantity=round(rng.uniform(0.1, 100), 4),
+                price=round(rng.uniform(1, 1000), 2),
+                currency=CURRENCIES[asset % len(CURRENCIES)],
+                trade_date=rng.choice(days),
+            )
+        )
+    return transactions
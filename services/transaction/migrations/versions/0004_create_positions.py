@@ -0,0 +1,68 @@
+"""create position projection table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_create_positions"
+down_revision = "0003_add_asset_metadata"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position",
+        sa.Column("asset_id", sa.String(), primary_key=True),
+        sa.Column("currency", sa.String(), primary_key=True),
+        sa.Column("asset_name", sa.String(), nullable=False),
+        sa.Column("asset_type", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("invested", sa.Float(), nullable=False),
+        sa.Column("last_price", sa.Float(), nullable=False),
+        sa.Column("last_trade_date", sa.Date(), nullable=False),
+    )
+
+    # Backfill from the existing transaction log in SQL, with the semantics of
+    # `python -m app.cli rebuild-positions` as of this revision: signed sums,
+    # last price/date of the latest trade, latest non-empty name and type.
+    # Self-contained on purpose: it must not change with the application code.
+    op.execute(BACKFILL_POSITIONS)
+
+
+BACKFILL_POSITIONS = """
+INSERT INTO position (asset_id, currency, asset_name, asset_type, quantity, invested, last_price, last_trade_date)
+SELECT
+    asset_id,
+    currency,
+    COALESCE(NULLIF(MAX(CASE WHEN name_rank = 1 THEN asset_name END), ''), 'Unknown Asset'),
+    COALESCE(NULLIF(MAX(CASE WHEN type_rank = 1 THEN asset_type END), ''), 'UNKNOWN'),
+    SUM(signed_quantity),
+    SUM(signed_quantity * price),
+    MAX(CASE WHEN trade_rank = 1 THEN price END),
+    MAX(trade_date)
+FROM (
+    SELECT
+        asset_id,
+        currency,
+        asset_name,
+        asset_type,
+        price,
+        trade_date,
+        CASE WHEN operation_type = 'BUY' THEN quantity ELSE -quantity END AS signed_quantity,
+        ROW_NUMBER() OVER (PARTITION BY asset_id, currency ORDER BY trade_date DESC, id DESC) AS trade_rank,
+        ROW_NUMBER() OVER (
+            PARTITION BY asset_id, currency
+            ORDER BY (asset_name IS NULL OR asset_name = ''), trade_date DESC, id DESC
+        ) AS name_rank,
+        ROW_NUMBER() OVER (
+            PARTITION BY asset_id, currency
+            ORDER BY (asset_type IS NULL OR asset_type = ''), trade_date DESC, id DESC
+        ) AS type_rank
+    FROM "transaction"
+) AS ranked
+GROUP BY asset_id, currency
+"""
+
+
+def downgrade() -> None:
+    op.drop_table("position")
@@ -0,0 +1,20 @@
+"""add (asset_id, operation_type) index for SELL validation"""
+
+from alembic import op
+
+revision = "0005_add_asset_operation_index"
+down_revision = "0004_create_positions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_transaction_asset_id_operation_type",
+        "transaction",
+        ["asset_id", "operation_type"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transaction_asset_id_operation_type", table_name="transaction")
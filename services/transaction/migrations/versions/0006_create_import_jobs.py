@@ -0,0 +1,40 @@
+"""create import_job table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_create_import_jobs"
+down_revision = "0005_add_asset_operation_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "import_job",
+        sa.Column("id", sa.Uuid(), primary_key=True),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "RUNNING", "COMPLETED", "FAILED", name="importjobstatus"),
+            nullable=False,
+        ),
+        sa.Column("file_name", sa.String(), nullable=True),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("batch_size", sa.Integer(), nullable=False),
+        sa.Column("rows_processed", sa.Integer(), nullable=False),
+        sa.Column("inserted", sa.Integer(), nullable=False),
+        sa.Column("skipped", sa.Integer(), nullable=False),
+        sa.Column("errors", sa.JSON(), nullable=False),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_import_job_status", "import_job", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_import_job_status", table_name="import_job")
+    op.drop_table("import_job")
+    sa.Enum(name="importjobstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,25 @@
+"""add keyset pagination indexes on transaction"""
+
+from alembic import op
+
+revision = "0007_add_pagination_indexes"
+down_revision = "0006_create_import_jobs"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_transaction_trade_date_id": ["trade_date", "id"],
+    "ix_transaction_asset_id_trade_date_id": ["asset_id", "trade_date", "id"],
+    "ix_transaction_currency_trade_date_id": ["currency", "trade_date", "id"],
+    "ix_transaction_operation_type_trade_date_id": ["operation_type", "trade_date", "id"],
+}
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES.items():
+        op.create_index(name, "transaction", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="transaction")
@@ -0,0 +1,45 @@
+"""add transaction.seq and portfolio_checkpoint table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_add_transaction_seq_and_checkpoints"
+down_revision = "0008_create_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.add_column("transaction", sa.Column("seq", sa.BigInteger(), nullable=True))
+    # Existing rows are numbered once (any order works: they all precede the first checkpoint).
+    if bind.dialect.name == "postgresql":
+        op.execute(sa.schema.CreateSequence(sa.Sequence("transaction_seq")))
+        op.execute(
+            'UPDATE "transaction" AS t SET seq = s.seq FROM ('
+            "SELECT id, nextval('transaction_seq') AS seq FROM "
+            '(SELECT id FROM "transaction" ORDER BY trade_date, id) AS ordered'
+            ") AS s WHERE t.id = s.id"
+        )
+        op.execute("ALTER TABLE \"transaction\" ALTER COLUMN seq SET DEFAULT nextval('transaction_seq')")
+    else:
+        op.execute('UPDATE "transaction" SET seq = rowid')
+    op.create_index("uq_transaction_seq", "transaction", ["seq"], unique=True)
+
+    op.create_table(
+        "portfolio_checkpoint",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.Column("state", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_portfolio_checkpoint_seq", "portfolio_checkpoint", ["seq"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_portfolio_checkpoint_seq", table_name="portfolio_checkpoint")
+    op.drop_table("portfolio_checkpoint")
+    op.drop_index("uq_transaction_seq", table_name="transaction")
+    op.drop_column("transaction", "seq")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.schema.DropSequence(sa.Sequence("transaction_seq")))
@@ -0,0 +1,24 @@
+"""create price table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_create_prices"
+down_revision = "0009_add_transaction_seq_and_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The primary key order also serves the latest-close-per-asset lookup.
+    op.create_table(
+        "price",
+        sa.Column("asset_id", sa.String(), primary_key=True),
+        sa.Column("currency", sa.String(), primary_key=True),
+        sa.Column("price_date", sa.Date(), primary_key=True),
+        sa.Column("close", sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("price")
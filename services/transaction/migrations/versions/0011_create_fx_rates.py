@@ -0,0 +1,22 @@
+"""create fx_rate table"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_create_fx_rates"
+down_revision = "0010_create_prices"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fx_rate",
+        sa.Column("currency", sa.String(), primary_key=True),
+        sa.Column("rate_date", sa.Date(), primary_key=True),
+        sa.Column("rate", sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("fx_rate")
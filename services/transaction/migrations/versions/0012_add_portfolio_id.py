@@ -0,0 +1,58 @@
+"""add portfolio_id to transaction, position, import_job and portfolio_checkpoint"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_add_portfolio_id"
+down_revision = "0011_create_fx_rates"
+branch_labels = None
+depends_on = None
+
+TABLES = ("transaction", "position", "import_job", "portfolio_checkpoint")
+
+TRANSACTION_INDEXES = {
+    "ix_transaction_portfolio_id_asset_id_trade_date": ["portfolio_id", "asset_id", "trade_date"],
+    "ix_transaction_portfolio_id_trade_date_id": ["portfolio_id", "trade_date", "id"],
+}
+
+
+def upgrade() -> None:
+    # Existing rows belong to the default portfolio served by the unscoped routes.
+    for table in TABLES:
+        op.add_column(
+            table, sa.Column("portfolio_id", sa.String(), nullable=False, server_default="default")
+        )
+
+    op.drop_constraint("position_pkey", "position", type_="primary")
+    op.create_primary_key("position_pkey", "position", ["portfolio_id", "asset_id", "currency"])
+
+    op.drop_constraint("uq_transaction_idempotency_key", "transaction", type_="unique")
+    op.create_index(
+        "uq_transaction_portfolio_id_idempotency_key",
+        "transaction",
+        ["portfolio_id", "idempotency_key"],
+        unique=True,
+    )
+    for name, columns in TRANSACTION_INDEXES.items():
+        op.create_index(name, "transaction", columns)
+
+    op.drop_index("ix_portfolio_checkpoint_seq", table_name="portfolio_checkpoint")
+    op.create_index(
+        "ix_portfolio_checkpoint_portfolio_id_seq", "portfolio_checkpoint", ["portfolio_id", "seq"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_portfolio_checkpoint_portfolio_id_seq", table_name="portfolio_checkpoint")
+    op.create_index("ix_portfolio_checkpoint_seq", "portfolio_checkpoint", ["seq"])
+
+    for name in TRANSACTION_INDEXES:
+        op.drop_index(name, table_name="transaction")
+    op.drop_index("uq_transaction_portfolio_id_idempotency_key", table_name="transaction")
+    op.create_unique_constraint("uq_transaction_idempotency_key", "transaction", ["idempotency_key"])
+
+    op.drop_constraint("position_pkey", "position", type_="primary")
+    op.create_primary_key("position_pkey", "position", ["asset_id", "currency"])
+
+    for table in TABLES:
+        op.drop_column(table, "portfolio_id")
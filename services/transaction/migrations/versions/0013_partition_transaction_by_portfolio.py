@@ -0,0 +1,91 @@
+"""optionally hash-partition transaction by portfolio_id (Postgres)
+
+Enabled by TRANSACTION_PARTITIONS=<n> when running the migration; otherwise,
+and on other databases, this revision is a no-op. Postgres requires the
+partition key in every unique constraint, so the primary key becomes
+(portfolio_id, id) and seq/idempotency uniqueness is enforced per portfolio
+(seq values still come from the global transaction_seq sequence).
+"""
+
+import os
+
+from alembic import op
+
+revision = "0013_partition_transaction_by_portfolio"
+down_revision = "0012_add_portfolio_id"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_transaction_asset_id_operation_type": ["asset_id", "operation_type"],
+    "ix_transaction_trade_date_id": ["trade_date", "id"],
+    "ix_transaction_asset_id_trade_date_id": ["asset_id", "trade_date", "id"],
+    "ix_transaction_currency_trade_date_id": ["currency", "trade_date", "id"],
+    "ix_transaction_operation_type_trade_date_id": ["operation_type", "trade_date", "id"],
+    "ix_transaction_portfolio_id_asset_id_trade_date": ["portfolio_id", "asset_id", "trade_date"],
+    "ix_transaction_portfolio_id_trade_date_id": ["portfolio_id", "trade_date", "id"],
+}
+UNIQUE_INDEXES = {
+    "uq_transaction_seq": ["portfolio_id", "seq"],
+    "uq_transaction_portfolio_id_idempotency_key": ["portfolio_id", "idempotency_key"],
+}
+
+
+def _partitions() -> int:
+    if op.get_bind().dialect.name != "postgresql":
+        return 0
+    return int(os.getenv("TRANSACTION_PARTITIONS", "0"))
+
+
+def _is_partitioned() -> bool:
+    return bool(
+        op.get_bind().exec_driver_sql(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = '\"transaction\"'::regclass"
+        ).scalar()
+    )
+
+
+def upgrade() -> None:
+    partitions = _partitions()
+    if partitions <= 0:
+        return
+
+    op.rename_table("transaction", "transaction_unpartitioned")
+    op.execute(
+        'CREATE TABLE "transaction" (LIKE transaction_unpartitioned INCLUDING DEFAULTS) '
+        "PARTITION BY HASH (portfolio_id)"
+    )
+    for remainder in range(partitions):
+        op.execute(
+            f'CREATE TABLE transaction_p{remainder} PARTITION OF "transaction" '
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+    op.execute('INSERT INTO "transaction" SELECT * FROM transaction_unpartitioned')
+    op.drop_table("transaction_unpartitioned")
+
+    op.create_primary_key("transaction_pkey", "transaction", ["portfolio_id", "id"])
+    for name, columns in UNIQUE_INDEXES.items():
+        op.create_index(name, "transaction", columns, unique=True)
+    for name, columns in INDEXES.items():
+        op.create_index(name, "transaction", columns)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql" or not _is_partitioned():
+        return
+
+    op.rename_table("transaction", "transaction_partitioned")
+    op.execute('CREATE TABLE "transaction" (LIKE transaction_partitioned INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO "transaction" SELECT * FROM transaction_partitioned')
+    op.drop_table("transaction_partitioned")
+
+    op.create_primary_key("transaction_pkey", "transaction", ["id"])
+    op.create_index("uq_transaction_seq", "transaction", ["seq"], unique=True)
+    op.create_index(
+        "uq_transaction_portfolio_id_idempotency_key",
+        "transaction",
+        ["portfolio_id", "idempotency_key"],
+        unique=True,
+    )
+    for name, columns in INDEXES.items():
+        op.create_index(name, "transaction", columns)
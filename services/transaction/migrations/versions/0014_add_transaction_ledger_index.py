@@ -0,0 +1,31 @@
+"""add covering index for the ledger reads of the portfolio engines"""
+
+from alembic import op
+
+revision = "0014_add_transaction_ledger_index"
+down_revision = "0013_partition_transaction_by_portfolio"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # INCLUDE is Postgres-only (ignored elsewhere): the payload columns are
+    # stored in the leaf pages so ledger reads become index-only scans.
+    op.create_index(
+        "ix_transaction_ledger",
+        "transaction",
+        ["portfolio_id", "trade_date", "seq"],
+        postgresql_include=[
+            "asset_id",
+            "asset_name",
+            "asset_type",
+            "operation_type",
+            "quantity",
+            "price",
+            "currency",
+        ],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transaction_ledger", table_name="transaction")
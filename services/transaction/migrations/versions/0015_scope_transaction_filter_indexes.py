@@ -0,0 +1,45 @@
+"""lead the transaction filter indexes with portfolio_id
+
+Every list query is scoped to one portfolio, so the unscoped filter indexes
+of 0005/0007 are no longer used: the asset filter and SELL availability go
+through ix_transaction_portfolio_id_asset_id_trade_date, the unfiltered page
+through ix_transaction_portfolio_id_trade_date_id.
+"""
+
+from alembic import op
+
+revision = "0015_scope_transaction_filter_indexes"
+down_revision = "0014_add_transaction_ledger_index"
+branch_labels = None
+depends_on = None
+
+DROPPED_INDEXES = {
+    "ix_transaction_asset_id_operation_type": ["asset_id", "operation_type"],
+    "ix_transaction_trade_date_id": ["trade_date", "id"],
+    "ix_transaction_asset_id_trade_date_id": ["asset_id", "trade_date", "id"],
+    "ix_transaction_currency_trade_date_id": ["currency", "trade_date", "id"],
+    "ix_transaction_operation_type_trade_date_id": ["operation_type", "trade_date", "id"],
+}
+INDEXES = {
+    "ix_transaction_portfolio_id_currency_trade_date_id": ["portfolio_id", "currency", "trade_date", "id"],
+    "ix_transaction_portfolio_id_operation_type_trade_date_id": [
+        "portfolio_id",
+        "operation_type",
+        "trade_date",
+        "id",
+    ],
+}
+
+
+def upgrade() -> None:
+    for name in DROPPED_INDEXES:
+        op.drop_index(name, table_name="transaction")
+    for name, columns in INDEXES.items():
+        op.create_index(name, "transaction", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="transaction")
+    for name, columns in DROPPED_INDEXES.items():
+        op.create_index(name, "transaction", columns)
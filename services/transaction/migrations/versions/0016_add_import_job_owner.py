@@ -0,0 +1,22 @@
+"""add owner to import_job
+
+A worker claims a job by setting owner with a conditional UPDATE; updated_at,
+refreshed by every committed batch, is the lease another worker waits out
+before taking over a RUNNING job.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016_add_import_job_owner"
+down_revision = "0015_scope_transaction_filter_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("import_job", sa.Column("owner", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("import_job", "owner")
@@ -0,0 +1,22 @@
+"""add error_count to import_job
+
+import_job.errors keeps only the first errors of a job; error_count has the total.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0017_add_import_job_error_count"
+down_revision = "0016_add_import_job_owner"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("import_job", sa.Column("error_count", sa.Integer(), nullable=False, server_default="0"))
+    op.execute("UPDATE import_job SET error_count = skipped")
+    op.alter_column("import_job", "error_count", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("import_job", "error_count")
@@ -0,0 +1,53 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.domain.lots import CostMethod, match_lots
+from app.domain.models import OperationType
+
+
+def trade(operation_type: OperationType, quantity: float, price: float, day: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        asset_id="LOT1",
+        currency="USD",
+        operation_type=operation_type,
+        quantity=quantity,
+        price=price,
+        trade_date=date(2024, 1, day),
+    )
+
+
+HISTORY = [
+    trade(OperationType.BUY, 10, 100, 1),
+    trade(OperationType.BUY, 10, 120, 2),
+    trade(OperationType.SELL, 15, 130, 3),
+]
+
+
+@pytest.mark.parametrize(
+    ("method", "realized", "open_price", "closed"),
+    [
+        (CostMethod.FIFO, 350.0, 120.0, [(10, 100.0), (5, 120.0)]),
+        (CostMethod.LIFO, 250.0, 100.0, [(10, 120.0), (5, 100.0)]),
+        (CostMethod.AVERAGE, 300.0, 110.0, [(15, 110.0)]),
+    ],
+)
+def test_match_lots_methods(method, realized, open_price, closed):
+    report = match_lots(HISTORY, method)
+    [position] = report.positions
+    assert report.total_realized_pl == pytest.approx(realized)
+    assert position.quantity == pytest.approx(5)
+    assert position.cost_basis == pytest.approx(5 * open_price)
+    assert [(lot.quantity, lot.cost_price) for lot in report.closed_lots] == closed
+    assert all(lot.close_date == date(2024, 1, 3) for lot in report.closed_lots)
+
+
+def test_match_lots_sell_before_buy_opens_short_lot():
+    report = match_lots([trade(OperationType.SELL, 5, 50, 1), trade(OperationType.BUY, 8, 40, 2)], CostMethod.FIFO)
+    [position] = report.positions
+    [closed] = report.closed_lots
+    assert (closed.quantity, closed.cost_price, closed.close_price) == (-5, 50, 40)
+    assert closed.realized_pl == pytest.approx(50)
+    assert position.quantity == pytest.approx(3)
+    assert position.cost_basis == pytest.approx(120)
@@ -0,0 +1,76 @@
+import random
+from dataclasses import asdict
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.domain.models import OperationType
+from app.domain.portfolio import build_portfolio_snapshot
+
+
+def make_transactions(count: int, seed: int = 7) -> list[SimpleNamespace]:
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    transactions = []
+    for _ in range(count):
+        asset = rng.randrange(40)
+        transactions.append(
+            SimpleNamespace(
+                asset_id=f"ASSET{asset}",
+                asset_name=rng.choice([None, "", f"Asset {asset}", f"Asset {asset} (renamed)"]),
+                asset_type=rng.choice([None, "ETF", "STOCK"]),
+                operation_type=OperationType.BUY if rng.random() < 0.7 else OperationType.SELL,
+                quantity=round(rng.uniform(0.1, 50), 4),
+                price=round(rng.uniform(1, 500), 3),
+                currency=rng.choice(["USD", "EUR", "GBP"]),
+                trade_date=start + timedelta(days=rng.randrange(1500)),
+            )
+        )
+    return transactions
+
+
+def test_columnar_engine_matches_python_engine_exactly():
+    pytest.importorskip("numpy")
+    from app.domain.portfolio_columnar import build_portfolio_snapshot_columnar, columns_from_rows
+
+    transactions = make_transactions(5000)
+    expected = build_portfolio_snapshot(transactions)
+    actual = build_portfolio_snapshot_columnar(columns_from_rows(transactions))
+    assert asdict(actual) == asdict(expected)
+
+
+def test_columnar_engine_handles_empty_input():
+    pytest.importorskip("numpy")
+    from app.domain.portfolio_columnar import build_portfolio_snapshot_columnar, columns_from_rows
+
+    assert asdict(build_portfolio_snapshot_columnar(columns_from_rows([]))) == asdict(build_portfolio_snapshot([]))
+
+
+def test_sql_engine_matches_python_engine():
+    from sqlmodel import Session, SQLModel, create_engine
+
+    from app.domain.models import Transaction
+    from app.domain.portfolio import accumulate_positions
+    from app.domain.portfolio_sql import aggregate_entries
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    transactions = make_transactions(3000)
+    with Session(engine) as session:
+        for seq, tx in enumerate(transactions, start=1):
+            session.add(Transaction(**vars(tx), seq=seq))
+        # Other portfolios must not leak into the aggregate.
+        session.add(Transaction(**vars(transactions[0]), portfolio_id="other", seq=len(transactions) + 1))
+        session.commit()
+        actual = {(entry["asset_id"], entry["currency"]): entry for entry in aggregate_entries(session, "default")}
+
+    expected = accumulate_positions(transactions)
+    assert actual.keys() == expected.keys()
+    for key, entry in expected.items():
+        # Sums only differ by floating point summation order.
+        assert actual[key] == {
+            **entry,
+            "quantity": pytest.approx(entry["quantity"], abs=1e-9),
+            "invested": pytest.approx(entry["invested"], rel=1e-9, abs=1e-6),
+        }
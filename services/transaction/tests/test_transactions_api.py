@@ -1,37 +1,65 @@
+import csv
+import importlib.util
+import io
+import json
 import os
 from datetime import date, timedelta
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import SQLModel, Session, create_engine
-from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 # Ensure a default DB URL for tests before importing app modules.
 os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+# The outbox relay would drain the default DB, not the per-test one.
+os.environ.setdefault("OUTBOX_BROKER", "none")
+os.environ.setdefault("CHECKPOINT_EVERY_EVENTS", "0")
 
 from app.main import app
-from app.core.database import get_session
+from app.core.database import get_async_session, get_session
+from app.domain.fx import fx_rates
+from app.domain.idempotency import idempotency_index
+from app.domain.prices import latest_prices
+from app.domain.snapshot_cache import snapshot_cache
 
 
 @pytest.fixture
-def engine():
-    # StaticPool keeps the same in-memory DB across connections.
+def engine(tmp_path):
+    # File-backed so the sync and async engines see the same database.
     engine = create_engine(
-        "sqlite://",
+        f"sqlite:///{tmp_path / 'test.db'}",
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
     )
     SQLModel.metadata.create_all(engine)
     return engine
 
 
 @pytest.fixture
-def client(engine):
+def async_engine(engine):
+    # NullPool: aiosqlite connections must not outlive the TestClient event loop.
+    return create_async_engine(engine.url.set(drivername="sqlite+aiosqlite"), poolclass=NullPool)
+
+
+@pytest.fixture
+def client(engine, async_engine):
     def get_session_override():
         with Session(engine) as session:
             yield session
 
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
+    # Process-wide caches must not leak state between per-test databases.
+    snapshot_cache.invalidate()
+    latest_prices.invalidate()
+    fx_rates.invalidate()
+    idempotency_index.clear()
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
@@ -135,6 +163,42 @@ def test_delete_transaction_not_found(client):
     assert body["code"] == "not_found"
 
 
+def test_batch_create_atomic_and_partial(client):
+    def item(asset_id, operation_type, quantity, **extra):
+        return {
+            "asset_id": asset_id,
+            "operation_type": operation_type,
+            "quantity": quantity,
+            "price": 10,
+            "currency": "USD",
+            "trade_date": "2024-01-10",
+            **extra,
+        }
+
+    # A SELL may consume a BUY earlier in the same batch; the last SELL oversells.
+    items = [
+        item("BAT1", "BUY", 5, idempotency_key="fill-1"),
+        item("BAT1", "SELL", 3),
+        item("BAT1", "SELL", 3),
+    ]
+    atomic = client.post("/transactions/batch", json={"items": items})
+    assert atomic.status_code == 400
+    assert [i["status"] for i in atomic.json()["items"]] == ["aborted", "aborted", "rejected"]
+    assert client.get("/transactions").json() == []
+
+    partial = client.post("/transactions/batch", json={"mode": "partial", "items": items}).json()
+    assert (partial["created"], partial["rejected"]) == (2, 1)
+    assert "only 2.0 available" in partial["items"][2]["message"]
+
+    retried = client.post("/transactions/batch", json={"items": items[:1]}).json()
+    assert retried["items"][0]["status"] == "duplicate"
+    assert retried["items"][0]["transaction"]["id"] == partial["items"][0]["transaction"]["id"]
+    assert client.get("/portfolio").json()["holdings"][0]["quantity"] == 2
+
+    too_many = {"items": [item("BAT2", "BUY", 1)] * 1001}
+    assert client.post("/transactions/batch", json=too_many).status_code == 400
+
+
 def test_events_published_in_memory(client, monkeypatch):
     # Clear in-memory bus
     from app.core import events
@@ -159,6 +223,41 @@ def test_events_published_in_memory(client, monkeypatch):
     assert "TransactionDeleted" in names
 
 
+def test_events_written_to_outbox_and_relayed(client, engine, tmp_path):
+    from app.core.events import DomainEvent, InMemoryEventBus
+    from app.core.outbox import FileBroker, OutboxRelay
+    from app.domain.models import OutboxEvent
+
+    payload = {
+        "asset_id": "OUT1",
+        "operation_type": "BUY",
+        "quantity": 1,
+        "price": 1,
+        "currency": "USD",
+        "trade_date": "2024-01-10",
+    }
+    tx_id = client.post("/transactions", json=payload).json()["id"]
+    client.delete(f"/transactions/{tx_id}")
+
+    with Session(engine) as session:
+        staged = session.exec(select(OutboxEvent).order_by(OutboxEvent.id)).all()
+    assert [event.name for event in staged] == ["TransactionCreated", "TransactionDeleted"]
+    assert staged[0].payload["id"] == tx_id
+
+    log_path = tmp_path / "events.log"
+    relay = OutboxRelay(engine, FileBroker(str(log_path)), batch_size=1)
+    assert relay.drain_once() == 1
+    assert relay.drain_once() == 1
+    assert relay.drain_once() == 0
+    lines = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["TransactionCreated", "TransactionDeleted"]
+
+    bus = InMemoryEventBus(max_events=2)
+    for event in staged * 2:
+        bus.publish(DomainEvent(name=event.name, payload=event.payload))
+    assert len(bus.list_events()) == 2
+
+
 def test_idempotency_key_returns_same_transaction(client):
     payload = {
         "asset_id": "ETF777",
@@ -177,6 +276,60 @@ def test_idempotency_key_returns_same_transaction(client):
     assert resp1.json()["id"] == resp2.json()["id"]
 
 
+def test_idempotency_index_skips_lookup_and_handles_conflicts(client, engine):
+    from app.domain.models import Transaction
+
+    payload = {
+        "asset_id": "IDX1",
+        "operation_type": "BUY",
+        "quantity": 1,
+        "price": 1,
+        "currency": "USD",
+        "trade_date": "2024-01-10",
+    }
+    import threading
+
+    from app.core.jobs import job_runner
+
+    # Warming doesn't queue behind import jobs occupying every job_runner worker.
+    release = threading.Event()
+    busy = [job_runner.submit(release.wait, 10) for _ in range(4)]
+    try:
+        idempotency_index.start_warming(engine).join(timeout=10)
+        assert not idempotency_index.might_exist("default", "k-1")
+    finally:
+        release.set()
+    assert all(future.result(timeout=10) for future in busy)
+
+    first = client.post("/transactions", json=payload, headers={"Idempotency-Key": "k-1"}).json()
+    assert idempotency_index.might_exist("default", "k-1")
+    again = client.post("/transactions", json=payload, headers={"Idempotency-Key": "k-1"}).json()
+    assert again["id"] == first["id"]
+
+    # Deleted: the remembered id no longer resolves, so the key can be reused.
+    client.delete(f"/transactions/{first['id']}")
+    reused = client.post("/transactions", json=payload, headers={"Idempotency-Key": "k-1"}).json()
+    assert reused["id"] != first["id"]
+
+    # Stored by another process: the index says "new", the unique index says otherwise.
+    with Session(engine) as session:
+        others = [
+            Transaction(**{**payload, "trade_date": date(2024, 1, 10)}, idempotency_key=key, seq=seq)
+            for key, seq in (("k-2", 1000), ("k-3", 1001))
+        ]
+        session.add_all(others)
+        session.commit()
+        other_ids = [str(other.id) for other in others]
+    assert not idempotency_index.might_exist("default", "k-2")
+    resp = client.post("/transactions", json=payload, headers={"Idempotency-Key": "k-2"})
+    assert resp.status_code == 200
+    assert resp.json()["id"] == other_ids[0]
+    batch = client.post("/transactions/batch", json={"items": [{**payload, "idempotency_key": "k-3"}]}).json()
+    assert batch["items"][0]["status"] == "duplicate"
+    assert batch["items"][0]["transaction"]["id"] == other_ids[1]
+    assert len(client.get("/transactions").json()) == 3
+
+
 def test_import_csv_and_portfolio_snapshot(client):
     csv_data = "\n".join(
         [
@@ -194,3 +347,899 @@ def test_import_csv_and_portfolio_snapshot(client):
     snapshot = client.get("/portfolio").json()
     assert snapshot["metrics"]["total_assets"] == 1
     assert snapshot["holdings"][0]["asset_id"] == "ETF_TEST"
+
+
+def test_positions_projection_tracks_create_and_delete(client, engine):
+    from app.domain.models import Position
+    from app.domain.positions import rebuild_positions
+
+    base = {"asset_id": "PROJ1", "currency": "USD", "quantity": 2, "price": 10}
+    client.post("/transactions", json={**base, "operation_type": "BUY", "trade_date": "2024-01-10"})
+    client.post("/transactions", json={**base, "operation_type": "BUY", "price": 30, "trade_date": "2024-01-12"})
+    # Backdated trade: must not become the last price.
+    backdated = client.post(
+        "/transactions", json={**base, "operation_type": "BUY", "price": 20, "trade_date": "2024-01-11"}
+    ).json()
+
+    with Session(engine) as session:
+        position = session.get(Position, ("default", "PROJ1", "USD"))
+        assert position.quantity == 6
+        assert position.invested == 120
+        assert position.last_price == 30
+
+    client.delete(f"/transactions/{backdated['id']}")
+    snapshot = client.get("/portfolio").json()
+    holding = snapshot["holdings"][0]
+    assert holding["quantity"] == 4
+    assert holding["invested"] == 80
+    assert holding["last_price"] == 30
+
+    with Session(engine) as session:
+        session.delete(session.get(Position, ("default", "PROJ1", "USD")))
+        session.commit()
+        assert rebuild_positions(session) == 1
+    assert client.get("/portfolio").json() == snapshot
+
+
+def test_rejected_atomic_batch_leaves_no_idempotency_keys(engine):
+    from app.domain.models import OperationType, Transaction
+    from app.domain.services import TransactionService
+
+    def trade(operation_type: OperationType, quantity: float) -> Transaction:
+        return Transaction(
+            asset_id="ATOM1",
+            operation_type=operation_type,
+            quantity=quantity,
+            price=10,
+            currency="USD",
+            trade_date=date(2024, 1, 10),
+        )
+
+    with Session(engine) as session:
+        service = TransactionService(session)
+        results = service.create_transactions(
+            [(trade(OperationType.BUY, 1), "atomic-1"), (trade(OperationType.SELL, 5), "atomic-2")], atomic=True
+        )
+        assert [result.status for result in results] == ["aborted", "rejected"]
+        # A later unit of work on the same service must not publish the aborted key.
+        service.create_transactions([(trade(OperationType.BUY, 1), "atomic-3")])
+
+    assert idempotency_index.lookup("default", "atomic-1") is None
+    assert idempotency_index.lookup("default", "atomic-3") is not None
+
+
+def test_positions_projection_survives_concurrent_buys(engine):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.domain.models import OperationType, Transaction
+    from app.domain.positions import list_positions, rebuild_positions
+    from app.domain.services import TransactionService
+
+    def buy(index: int) -> None:
+        with Session(engine) as session:
+            TransactionService(session).create_transaction(
+                Transaction(
+                    # The first trades of each key race on inserting the position row.
+                    asset_id=f"RACE{index % 2}",
+                    operation_type=OperationType.BUY,
+                    quantity=1,
+                    price=10 + index,
+                    currency="USD",
+                    trade_date=date(2024, 1, 1) + timedelta(days=index % 5),
+                )
+            )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(buy, range(40)))
+
+    with Session(engine) as session:
+        projected = sorted(list_positions(session, "default"), key=lambda row: row["asset_id"])
+        rebuild_positions(session)
+        rebuilt = sorted(list_positions(session, "default"), key=lambda row: row["asset_id"])
+    assert [row["quantity"] for row in projected] == [20, 20]
+    assert projected == rebuilt
+
+
+def test_sell_validation_uses_net_quantity(client):
+    base = {"asset_id": "NET1", "price": 10, "currency": "USD", "trade_date": "2024-01-10"}
+    assert client.post("/transactions", json={**base, "operation_type": "BUY", "quantity": 5}).status_code == 200
+    assert client.post("/transactions", json={**base, "operation_type": "SELL", "quantity": 3}).status_code == 200
+    assert client.post("/transactions", json={**base, "operation_type": "SELL", "quantity": 2}).status_code == 200
+
+    resp = client.post("/transactions", json={**base, "operation_type": "SELL", "quantity": 0.5})
+    assert resp.status_code == 400
+    assert resp.json()["message"] == "Cannot sell 0.5, only 0.0 available"
+
+
+def test_import_csv_batches_validate_in_row_order(client):
+    csv_data = "\n".join(
+        [
+            "asset_id,operation_type,quantity,price,currency,trade_date,idempotency_key",
+            "BATCH1,BUY,3,10.0,USD,2024-01-10,k1",
+            "BATCH1,SELL,2,12.0,USD,2024-01-11,",
+            "BATCH1,SELL,2,12.0,USD,2024-01-12,",
+            "BATCH1,BUY,3,10.0,USD,2024-01-10,k1",
+            "BATCH1,BUY,abc,10.0,USD,2024-01-10,",
+            "BATCH1,HOLD,1,10.0,USD,2024-01-10,",
+            "BATCH1,SELL,1,12.0,USD,2024-01-13,",
+        ]
+    )
+    files = {"file": ("sample.csv", csv_data, "text/csv")}
+    resp = client.post("/imports/transactions", params={"batch_size": 2}, files=files)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["inserted"] == 4
+    assert body["skipped"] == 3
+    assert body["errors"] == [
+        {"row_number": 4, "message": "Cannot sell 2.0, only 1.0 available"},
+        {"row_number": 6, "message": "Invalid number: abc"},
+        {"row_number": 7, "message": "Invalid operation_type: HOLD"},
+    ]
+
+    transactions = client.get("/transactions").json()
+    assert len(transactions) == 3
+    # BUY 3, SELL 2, SELL 1: the position is closed.
+    assert client.get("/portfolio").json()["holdings"] == []
+
+
+def test_import_csv_stream_reports_progress(client):
+    rows = [f"STREAM1,BUY,1,10.0,USD,2024-01-{day:02d}" for day in range(1, 6)]
+    csv_data = "﻿" + "\r\n".join(["asset_id,operation_type,quantity,price,currency,trade_date", *rows, "STREAM1,SELL,9,10.0,USD,2024-01-09"])
+    files = {"file": ("sample.csv", csv_data.encode("utf-8"), "text/csv")}
+    resp = client.post("/imports/transactions/stream", params={"batch_size": 2}, files=files)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["rows_processed"] for line in lines] == [2, 4, 6]
+    assert [line["done"] for line in lines] == [False, False, True]
+    assert lines[-1]["inserted"] == 5
+    assert lines[-1]["skipped"] == 1
+    assert lines[-1]["errors"] == [{"row_number": 7, "message": "Cannot sell 9.0, only 5.0 available"}]
+
+
+def test_iter_text_lines_decodes_across_chunks():
+    from app.api.parsing import iter_text_lines
+
+    data = '﻿a,b\n"multi\nline",café\n1,2'.encode("utf-8")
+    lines = list(iter_text_lines(io.BytesIO(data), chunk_size=3))
+    assert "".join(lines) == 'a,b\n"multi\nline",café\n1,2'
+    assert list(csv.reader(lines)) == [["a", "b"], ["multi\nline", "café"], ["1", "2"]]
+
+
+def test_import_job_runs_in_background(client, tmp_path, monkeypatch):
+    from app.core.jobs import job_runner
+
+    jobs_dir = tmp_path / "jobs"
+    monkeypatch.delenv("IMPORT_JOBS_DIR", raising=False)
+    disabled = client.post("/imports/jobs", files={"file": ("job.csv", "asset_id\n", "text/csv")})
+    assert disabled.status_code == 503
+    monkeypatch.setenv("IMPORT_JOBS_DIR", str(jobs_dir))
+    csv_data = "\n".join(
+        [
+            "asset_id,operation_type,quantity,price,currency,trade_date",
+            "JOB1,BUY,2,10.0,USD,2024-01-10",
+            "JOB1,BUY,x,10.0,USD,2024-01-11",
+            "JOB1,SELL,1,12.0,USD,2024-01-12",
+        ]
+    )
+    files = {"file": ("job.csv", csv_data, "text/csv")}
+    resp = client.post("/imports/jobs", params={"batch_size": 2}, files=files)
+    assert resp.status_code == 202
+    job_id = resp.json()["id"]
+
+    job_runner.join(timeout=10)
+    job = client.get(f"/imports/jobs/{job_id}").json()
+    assert job["status"] == "COMPLETED"
+    assert job["rows_processed"] == 3
+    assert job["inserted"] == 2
+    assert job["skipped"] == 1
+    assert job["errors"] == [{"row_number": 3, "message": "Invalid number: x"}]
+    assert job["error_count"] == 1
+    assert list(jobs_dir.iterdir()) == []
+
+    assert client.get("/imports/jobs/00000000-0000-0000-0000-000000000000").status_code == 404
+
+
+def test_import_job_resumes_after_last_committed_batch(engine, tmp_path):
+    from app.api.imports import process_import_job
+    from app.domain.models import ImportJob, ImportJobStatus, Transaction, utcnow
+
+    path = tmp_path / "resume.csv"
+    path.write_text(
+        "\n".join(
+            [
+                "asset_id,operation_type,quantity,price,currency,trade_date",
+                "RES1,BUY,1,10.0,USD,2024-01-10",
+                "RES1,BUY,1,10.0,USD,2024-01-11",
+                "RES1,BUY,1,10.0,USD,2024-01-12",
+            ]
+        )
+    )
+    with Session(engine) as session:
+        # Simulate a worker that crashed after the first row was committed.
+        job = ImportJob(
+            file_path=str(path),
+            batch_size=1,
+            status=ImportJobStatus.RUNNING,
+            owner="dead-worker",
+            rows_processed=1,
+            inserted=1,
+        )
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    # Its lease is still fresh: nobody else may take the job over yet.
+    process_import_job(job_id, engine)
+    with Session(engine) as session:
+        assert session.get(ImportJob, job_id).rows_processed == 1
+        session.get(ImportJob, job_id).updated_at = utcnow() - timedelta(hours=1)
+        session.commit()
+
+    process_import_job(job_id, engine)
+
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        assert job.status == ImportJobStatus.COMPLETED
+        assert (job.rows_processed, job.inserted, job.skipped) == (3, 3, 0)
+        dates = sorted(tx.trade_date.isoformat() for tx in session.exec(select(Transaction)))
+    assert dates == ["2024-01-11", "2024-01-12"]
+
+
+def test_import_job_stores_first_errors_and_counts_all(engine, tmp_path, monkeypatch):
+    from app.api import imports
+    from app.domain.models import ImportJob
+
+    rows = [f"ERR1,BUY,x{index},10.0,USD,2024-01-10" for index in range(5)]
+    path = tmp_path / "errors.csv"
+    path.write_text("\n".join(["asset_id,operation_type,quantity,price,currency,trade_date", *rows]))
+    with Session(engine) as session:
+        job = ImportJob(file_path=str(path), batch_size=1)
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    monkeypatch.setattr(imports, "IMPORT_JOB_MAX_ERRORS", 2)
+    imports.process_import_job(job_id, engine)
+
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        assert [error["row_number"] for error in job.errors] == [2, 3]
+        assert (job.error_count, job.skipped) == (5, 5)
+
+
+def test_racing_workers_import_a_job_once(engine, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.api.imports import process_import_job
+    from app.domain.models import ImportJob, ImportJobStatus, Transaction
+
+    rows = [f"RACEJOB,BUY,1,10.0,USD,2024-01-{day:02d}" for day in range(1, 21)]
+    path = tmp_path / "race.csv"
+    path.write_text("\n".join(["asset_id,operation_type,quantity,price,currency,trade_date", *rows]))
+    with Session(engine) as session:
+        job = ImportJob(file_path=str(path), batch_size=5)
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    # Two workers (or replicas) queued the same PENDING job.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda _: process_import_job(job_id, engine), range(2)))
+
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        assert (job.status, job.inserted) == (ImportJobStatus.COMPLETED, 20)
+        stored = session.exec(select(Transaction).where(Transaction.asset_id == "RACEJOB")).all()
+    assert len(stored) == 20
+
+
+def test_failed_import_job_removes_its_upload(engine, tmp_path, monkeypatch):
+    from app.api import imports
+    from app.domain.models import ImportJob, ImportJobStatus
+
+    path = tmp_path / "broken.csv"
+    path.write_text("asset_id,operation_type,quantity,price,currency,trade_date\n")
+    with Session(engine) as session:
+        job = ImportJob(file_path=str(path), batch_size=1)
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    def broken_import(*args, **kwargs):
+        raise RuntimeError("disk error")
+        yield
+
+    monkeypatch.setattr(imports, "_run_import", broken_import)
+    imports.process_import_job(job_id, engine)
+
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        assert (job.status, job.message) == (ImportJobStatus.FAILED, "disk error")
+    assert not path.exists()
+
+
+def test_list_transactions_keyset_pagination_and_filters(client):
+    for day in range(1, 6):
+        for asset_id in ("PAGE_A", "PAGE_B"):
+            client.post(
+                "/transactions",
+                json={
+                    "asset_id": asset_id,
+                    "operation_type": "BUY",
+                    "quantity": 1,
+                    "price": 10,
+                    "currency": "USD" if asset_id == "PAGE_A" else "EUR",
+                    "trade_date": f"2024-02-0{day}",
+                },
+            )
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, "asset_id": "PAGE_A"}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get("/transactions", params=params)
+        assert resp.status_code == 200
+        seen.extend(resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert [tx["trade_date"] for tx in seen] == [f"2024-02-0{day}" for day in range(5, 0, -1)]
+    assert {tx["asset_id"] for tx in seen} == {"PAGE_A"}
+
+    resp = client.get(
+        "/transactions", params={"currency": "eur", "date_from": "2024-02-02", "date_to": "2024-02-03"}
+    )
+    assert [tx["trade_date"] for tx in resp.json()] == ["2024-02-03", "2024-02-02"]
+    assert "X-Next-Cursor" not in resp.headers
+
+    resp = client.get("/transactions", params={"cursor": "not-a-cursor"})
+    assert resp.status_code == 400
+    assert resp.json()["code"] == "invalid_request"
+
+
+def test_export_transactions_round_trips_through_import(client, tmp_path):
+    csv_data = "\n".join(
+        [
+            "asset_id,asset_name,asset_type,operation_type,quantity,price,currency,trade_date,idempotency_key",
+            "EXP1,Export ETF,ETF,BUY,2,100.5,EUR,2024-01-10,exp-1",
+            "EXP1,,,SELL,1,101.0,EUR,2024-01-11,",
+        ]
+    )
+    client.post("/imports/transactions", files={"file": ("in.csv", csv_data, "text/csv")})
+
+    resp = client.get("/exports/transactions", params={"format": "csv"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [(r["asset_id"], r["operation_type"], r["quantity"], r["trade_date"]) for r in rows] == [
+        ("EXP1", "BUY", "2.0", "2024-01-10"),
+        ("EXP1", "SELL", "1.0", "2024-01-11"),
+    ]
+    assert rows[0]["idempotency_key"] == "exp-1"
+
+    # The export is accepted as-is by the importer.
+    reimport = client.post("/imports/transactions", files={"file": ("out.csv", resp.text, "text/csv")}).json()
+    assert reimport["errors"] == []
+
+    resp = client.get("/exports/transactions", params={"format": "ndjson"})
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    assert records[0]["asset_name"] == "Export ETF"
+    assert records[0]["price"] == 100.5
+
+
+def test_export_transactions_parquet(client):
+    pq = pytest.importorskip("pyarrow.parquet")
+    for day in (10, 11):
+        client.post(
+            "/transactions",
+            json={
+                "asset_id": "PQ1",
+                "operation_type": "BUY",
+                "quantity": 1,
+                "price": 10,
+                "currency": "USD",
+                "trade_date": f"2024-01-{day}",
+            },
+        )
+    resp = client.get("/exports/transactions", params={"format": "parquet"})
+    assert resp.status_code == 200
+    table = pq.read_table(io.BytesIO(resp.content))
+    assert table.num_rows == 2
+    assert table.column("asset_id").to_pylist() == ["PQ1", "PQ1"]
+
+
+def test_portfolio_engines_agree(client):
+    for payload in (
+        {"asset_id": "ENG1", "operation_type": "BUY", "quantity": 3, "price": 10, "trade_date": "2024-01-10"},
+        {"asset_id": "ENG1", "operation_type": "SELL", "quantity": 1, "price": 12, "trade_date": "2024-01-11"},
+        {"asset_id": "ENG2", "operation_type": "BUY", "quantity": 5, "price": 7.5, "trade_date": "2024-01-09"},
+    ):
+        client.post("/transactions", json={**payload, "currency": "USD"})
+
+    expected = client.get("/portfolio", params={"engine": "projection"}).json()
+    assert client.get("/portfolio", params={"engine": "replay"}).json() == expected
+    assert client.get("/portfolio", params={"engine": "sql"}).json() == expected
+    if importlib.util.find_spec("numpy") is not None:
+        assert client.get("/portfolio", params={"engine": "columnar"}).json() == expected
+    assert client.get("/portfolio", params={"engine": "unknown"}).status_code == 422
+
+
+def test_checkpoint_engine_replays_only_newer_transactions(client, engine):
+    from app.domain.checkpoints import write_checkpoint
+    from app.domain.models import PortfolioCheckpoint
+
+    def post(asset_id, operation_type, quantity, price, trade_date):
+        payload = {
+            "asset_id": asset_id,
+            "operation_type": operation_type,
+            "quantity": quantity,
+            "price": price,
+            "currency": "USD",
+            "trade_date": trade_date,
+        }
+        return client.post("/transactions", json=payload).json()
+
+    def assert_engines_agree():
+        expected = client.get("/portfolio", params={"engine": "replay"}).json()
+        assert client.get("/portfolio", params={"engine": "checkpoint"}).json() == expected
+
+    post("CP1", "BUY", 3, 10, "2024-01-10")
+    post("CP2", "BUY", 1, 50, "2024-01-10")
+    with Session(engine) as session:
+        assert write_checkpoint(session).seq == 2
+        assert write_checkpoint(session) is None
+
+    post("CP1", "SELL", 1, 12, "2024-01-11")
+    post("CP3", "BUY", 2, 5, "2024-01-12")
+    # Backdated: CP2's last price must stay the 2024-01-10 one.
+    post("CP2", "BUY", 1, 40, "2024-01-05")
+    assert_engines_agree()
+    assert client.get("/portfolio", params={"engine": "checkpoint"}).json()["holdings"][0]["last_price"] == 50
+
+    with Session(engine) as session:
+        assert write_checkpoint(session).seq == 5
+    deleted = post("CP3", "BUY", 1, 6, "2024-01-13")
+    with Session(engine) as session:
+        write_checkpoint(session)
+    client.delete(f"/transactions/{deleted['id']}")
+    with Session(engine) as session:
+        # The checkpoint containing the deleted transaction is discarded.
+        assert session.exec(select(PortfolioCheckpoint.seq)).all() == [2, 5]
+    assert_engines_agree()
+
+
+def test_checkpoint_scheduler_does_not_wait_for_import_jobs(client, engine):
+    import threading
+
+    from app.core.jobs import job_runner
+    from app.domain.checkpoints import CheckpointScheduler, checkpoint_runner
+    from app.domain.models import PortfolioCheckpoint
+
+    release = threading.Event()
+    busy = [job_runner.submit(release.wait, 10) for _ in range(4)]
+    scheduler = CheckpointScheduler(engine, every_events=2)
+    scheduler.start()
+    try:
+        for day in (10, 11):
+            payload = {"asset_id": "CPJOB", "operation_type": "BUY", "quantity": 1, "price": 10, "currency": "USD"}
+            client.post("/transactions", json={**payload, "trade_date": f"2024-01-{day}"})
+        checkpoint_runner.join(timeout=10)
+        with Session(engine) as session:
+            assert session.exec(select(PortfolioCheckpoint.seq)).all() == [2]
+    finally:
+        scheduler.stop()
+        release.set()
+    assert all(future.result(timeout=10) for future in busy)
+
+
+def test_portfolio_history_matches_snapshots(client, engine):
+    from app.domain.models import Transaction
+    from app.domain.portfolio import build_portfolio_snapshot
+
+    for payload in (
+        {"asset_id": "HIS1", "operation_type": "BUY", "quantity": 3, "price": 10, "trade_date": "2024-01-10"},
+        {"asset_id": "HIS2", "operation_type": "BUY", "quantity": 2, "price": 7.5, "trade_date": "2024-01-20"},
+        {"asset_id": "HIS1", "operation_type": "SELL", "quantity": 3, "price": 12, "trade_date": "2024-02-05"},
+        {"asset_id": "HIS2", "operation_type": "BUY", "quantity": 1, "price": 9, "trade_date": "2024-03-01"},
+    ):
+        client.post("/transactions", json={**payload, "currency": "USD"})
+
+    resp = client.get("/portfolio/history", params={"from": "2024-01-01", "to": "2024-03-15", "interval": "monthly"})
+    assert resp.status_code == 200
+    points = [json.loads(line) for line in resp.text.splitlines()]
+    assert [point["date"] for point in points] == ["2024-01-31", "2024-02-29", "2024-03-15"]
+
+    with Session(engine) as session:
+        transactions = session.exec(select(Transaction)).all()
+    for point in points:
+        point_date = date.fromisoformat(point.pop("date"))
+        expected = build_portfolio_snapshot([tx for tx in transactions if tx.trade_date <= point_date]).metrics
+        assert point == expected.__dict__
+
+    daily = client.get("/portfolio/history", params={"to": "2024-01-12"}).text.splitlines()
+    assert [json.loads(line)["date"] for line in daily] == ["2024-01-10", "2024-01-11", "2024-01-12"]
+    assert client.get("/portfolio/history", params={"from": "2024-02-01", "to": "2024-01-01"}).status_code == 400
+
+    content = client.get("/openapi.json").json()["paths"]["/portfolio/history"]["get"]["responses"]["200"]["content"]
+    assert list(content) == ["application/x-ndjson"]
+
+
+def test_portfolio_history_values_points_at_marks(client):
+    base = {"asset_id": "HMK1", "currency": "USD", "operation_type": "BUY"}
+    client.post("/transactions", json={**base, "quantity": 2, "price": 10, "trade_date": "2024-01-10"})
+    client.post("/transactions", json={**base, "quantity": 1, "price": 12, "trade_date": "2024-01-13"})
+    csv_data = "\n".join(
+        [
+            "asset_id,currency,date,close",
+            "HMK1,USD,2024-01-11,15.0",
+            "HMK1,USD,2024-01-12,20.0",
+            "HMK1,USD,2024-01-14,30.0",
+            "OTHER,USD,2024-01-12,99.0",
+        ]
+    )
+    client.post("/prices/import", files={"file": ("prices.csv", csv_data, "text/csv")})
+
+    resp = client.get("/portfolio/history", params={"from": "2024-01-10", "to": "2024-01-14"})
+    values = [json.loads(line)["total_market_value"] for line in resp.text.splitlines()]
+    # Marks between trades move the value; the 01-13 trade is newer than the last mark until 01-14.
+    assert values == [20, 30, 40, 36, 90]
+    assert client.get("/portfolio/metrics").json()["total_market_value"] == 90
+
+
+def test_price_import_values_holdings_at_latest_close(client, monkeypatch):
+    from app.domain import prices
+
+    client.post(
+        "/transactions",
+        json={
+            "asset_id": "MRK1",
+            "operation_type": "BUY",
+            "quantity": 2,
+            "price": 10,
+            "currency": "USD",
+            "trade_date": "2024-01-10",
+        },
+    )
+    csv_data = "\n".join(
+        [
+            "asset_id,currency,date,close",
+            "MRK1,USD,2024-01-09,9.0",
+            "MRK1,USD,2024-01-12,15.0",
+            "MRK1,USD,2024-01-11,x",
+            # Not finite: would turn every valuation using them into NaN.
+            "MRK1,USD,2024-01-13,nan",
+            "MRK1,USD,2024-01-14,inf",
+        ]
+    )
+    resp = client.post("/prices/import", files={"file": ("prices.csv", csv_data, "text/csv")})
+    assert resp.json() == {
+        "inserted": 2,
+        "skipped": 3,
+        "errors": [
+            {"row_number": 4, "message": "Invalid number: x"},
+            {"row_number": 5, "message": "Invalid number: nan"},
+            {"row_number": 6, "message": "Invalid number: inf"},
+        ],
+    }
+
+    lookups = []
+    latest = prices._latest_prices
+    monkeypatch.setattr(prices, "_latest_prices", lambda *args: lookups.append(args) or latest(*args))
+
+    holding = client.get("/portfolio", params={"engine": "replay"}).json()["holdings"][0]
+    assert (holding["last_price"], holding["market_value"], holding["unrealized_pl"]) == (15.0, 30.0, 10.0)
+    client.get("/portfolio", params={"engine": "projection"})
+    assert len(lookups) == 1
+
+    ndjson = '{"asset_id": "MRK1", "currency": "USD", "date": "2024-01-12", "close": 11}\nnot json\n'
+    resp = client.post("/prices/import", files={"file": ("prices.ndjson", ndjson, "application/x-ndjson")})
+    assert resp.json()["errors"] == [{"row_number": 2, "message": "Invalid JSON object"}]
+    assert client.get("/portfolio").json()["holdings"][0]["last_price"] == 11.0
+    assert len(lookups) == 2
+
+
+def test_portfolio_base_currency_conversion(client):
+    for asset_id, currency, price in (("FX1", "USD", 100), ("FX2", "EUR", 50), ("FX3", "CHF", 20)):
+        resp = client.post(
+            "/transactions",
+            json={
+                "asset_id": asset_id,
+                "operation_type": "BUY",
+                "quantity": 1,
+                "price": price,
+                "currency": currency,
+                "trade_date": "2024-01-10",
+            },
+        )
+        assert resp.status_code == 200
+
+    assert client.get("/portfolio", params={"base_currency": "EUR"}).json()["message"] == (
+        f"No FX rate for CHF, EUR on or before {date.today().isoformat()}"
+    )
+    # Holdings already in the base currency need no rate.
+    eur_buy = {"asset_id": "FX2", "operation_type": "BUY", "quantity": 2, "price": 50, "currency": "EUR"}
+    client.post("/portfolios/eur-only/transactions", json={**eur_buy, "trade_date": "2024-01-10"})
+    only_eur = client.get("/portfolios/eur-only/metrics", params={"base_currency": "EUR"})
+    assert only_eur.json()["total_market_value"] == 100
+
+    csv_data = "\n".join(
+        [
+            "currency,date,rate",
+            "EUR,2024-01-01,1.0",
+            "EUR,2024-01-10,1.1",
+            "CHF,2024-01-10,1.2",
+            "USD,2024-01-10,1",
+            "CHF,2024-01-11,NaN",
+            "EUR,2024-01-11,-inf",
+        ]
+    )
+    resp = client.post("/fx-rates/import", files={"file": ("fx.csv", csv_data, "text/csv")})
+    assert resp.json()["inserted"] == 3
+    assert resp.json()["errors"] == [
+        {"row_number": 5, "message": "USD is the pivot currency, its rate is always 1"},
+        {"row_number": 6, "message": "Invalid number: NaN"},
+        {"row_number": 7, "message": "Invalid number: -inf"},
+    ]
+
+    metrics = client.get("/portfolio/metrics", params={"base_currency": "usd"}).json()
+    assert metrics["total_market_value"] == 100 + 55 + 24
+    snapshot = client.get("/portfolio", params={"base_currency": "EUR"}).json()
+    assert snapshot["metrics"]["total_market_value"] == round(100 / 1.1 + 50 + 24 / 1.1, 2)
+    by_currency = {bucket["label"]: bucket["market_value"] for bucket in snapshot["allocation"]["by_currency"]}
+    assert by_currency == {"USD": round(100 / 1.1, 2), "EUR": 50.0, "CHF": round(24 / 1.1, 2)}
+
+
+def test_realized_pnl_endpoint(client):
+    for payload in (
+        {"asset_id": "RPL1", "operation_type": "BUY", "quantity": 10, "price": 100, "trade_date": "2024-01-10"},
+        {"asset_id": "RPL1", "operation_type": "BUY", "quantity": 10, "price": 120, "trade_date": "2024-01-11"},
+        {"asset_id": "RPL1", "operation_type": "SELL", "quantity": 15, "price": 130, "trade_date": "2024-01-12"},
+        {"asset_id": "RPL2", "operation_type": "BUY", "quantity": 1, "price": 5, "trade_date": "2024-01-12"},
+    ):
+        client.post("/transactions", json={**payload, "currency": "USD"})
+
+    fifo = client.get("/portfolio/realized").json()
+    assert fifo["method"] == "fifo"
+    assert fifo["total_realized_pl"] == 350.0
+    # The per-position summary is the default; closed lots are opt-in and paged.
+    assert fifo["closed_lots"] is None
+    first = client.get("/portfolio/realized", params={"lots": True, "limit": 1})
+    assert [(lot["quantity"], lot["cost_price"]) for lot in first.json()["closed_lots"]] == [(10, 100)]
+    second = client.get(
+        "/portfolio/realized", params={"lots": True, "limit": 1, "cursor": first.headers["X-Next-Cursor"]}
+    )
+    assert [(lot["quantity"], lot["cost_price"]) for lot in second.json()["closed_lots"]] == [(5, 120)]
+    assert "X-Next-Cursor" not in second.headers
+    after = client.get("/portfolio/realized", params={"lots": True, "date_from": "2024-01-13"}).json()
+    assert after["closed_lots"] == [] and after["total_realized_pl"] == 350.0
+    assert client.get("/portfolio/realized", params={"lots": True, "cursor": "nope"}).status_code == 400
+
+    average = client.get("/portfolio/realized", params={"method": "average", "asset_id": "RPL1"}).json()
+    assert average["positions"] == [
+        {
+            "asset_id": "RPL1",
+            "currency": "USD",
+            "open_quantity": 5.0,
+            "cost_basis": 550.0,
+            "average_cost": 110.0,
+            "realized_pl": 300.0,
+        }
+    ]
+
+
+def test_portfolios_are_isolated(client):
+    buy = {
+        "asset_id": "ISO1",
+        "operation_type": "BUY",
+        "quantity": 5,
+        "price": 10,
+        "currency": "USD",
+        "trade_date": "2024-01-10",
+    }
+    headers = {"Idempotency-Key": "same-key"}
+    created = client.post("/portfolios/acme/transactions", json=buy, headers=headers).json()
+    assert created["portfolio_id"] == "acme"
+    other = client.post("/portfolios/other/transactions", json={**buy, "quantity": 1}, headers=headers).json()
+    assert other["id"] != created["id"]
+
+    # A portfolio can only sell what it holds itself.
+    sell = {**buy, "operation_type": "SELL", "quantity": 3, "trade_date": "2024-01-11"}
+    assert client.post("/portfolios/other/transactions", json=sell).status_code == 400
+    assert client.post("/portfolios/acme/transactions", json=sell).status_code == 200
+
+    assert client.get("/portfolios/acme").json()["holdings"][0]["quantity"] == 2
+    assert client.get("/portfolios/other").json()["holdings"][0]["quantity"] == 1
+    assert client.get("/portfolio").json()["holdings"] == []
+    assert client.get("/transactions").json() == []
+    assert len(client.get("/portfolios/acme/transactions").json()) == 2
+
+    assert client.delete(f"/portfolios/other/transactions/{created['id']}").status_code == 404
+    assert client.delete(f"/portfolios/acme/transactions/{created['id']}").status_code == 204
+    assert client.get("/portfolios/bad id/metrics").status_code == 400
+
+
+def test_portfolio_snapshot_cache_and_etag(client, monkeypatch):
+    from app.domain import engines
+
+    payload = {
+        "asset_id": "CACHE1",
+        "operation_type": "BUY",
+        "quantity": 1,
+        "price": 10,
+        "currency": "USD",
+        "trade_date": "2024-01-10",
+    }
+    client.post("/transactions", json=payload)
+
+    calls = []
+    compute_snapshot = engines.compute_snapshot
+
+    def counting_compute(session, engine, *args):
+        calls.append(engine)
+        return compute_snapshot(session, engine, *args)
+
+    monkeypatch.setattr("app.api.portfolio.compute_snapshot", counting_compute)
+
+    first = client.get("/portfolio")
+    etag = first.headers["ETag"]
+    assert client.get("/portfolio/metrics").headers["ETag"] == etag
+    assert client.get("/portfolio/allocation").status_code == 200
+    assert len(calls) == 1
+
+    not_modified = client.get("/portfolio", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    # If-None-Match lists, weak validators and "*" (RFC 9110 13.1.2).
+    for header in (f'"other", W/{etag}', f'W/"x,y", {etag}', "*"):
+        assert client.get("/portfolio", headers={"If-None-Match": header}).status_code == 304
+    assert client.get("/portfolio", headers={"If-None-Match": '"other", W/"x"'}).status_code == 200
+    assert len(calls) == 1
+
+    client.post("/transactions", json={**payload, "quantity": 2})
+    refreshed = client.get("/portfolio", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["ETag"] != etag
+    assert refreshed.json()["holdings"][0]["quantity"] == 3
+    assert len(calls) == 2
+
+
+def test_large_responses_are_compressed_and_keep_the_schema(client):
+    from app.api.schemas import PortfolioSnapshot, TransactionRead
+
+    items = [
+        {
+            "asset_id": f"ZIP{index}",
+            "asset_name": f"Compressed asset {index}",
+            "operation_type": "BUY",
+            "quantity": 1,
+            "price": 10,
+            "currency": "USD",
+            "trade_date": "2024-01-10",
+        }
+        for index in range(50)
+    ]
+    assert client.post("/transactions/batch", json={"mode": "atomic", "items": items}).status_code == 200
+
+    resp = client.get("/transactions", params={"limit": 50}, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["Content-Type"] == "application/json"
+    rows = resp.json()
+    assert len(rows) == 50
+    assert [TransactionRead.model_validate(row).model_dump(mode="json") for row in rows] == rows
+
+    snapshot = client.get("/portfolio", headers={"Accept-Encoding": "gzip"})
+    assert snapshot.headers["Content-Encoding"] == "gzip"
+    # Weak: the same tag covers the gzip and identity encodings of the snapshot.
+    assert snapshot.headers["ETag"].startswith('W/"')
+    assert {"Accept", "Accept-Encoding"} <= set(snapshot.headers["Vary"].split(", "))
+    assert PortfolioSnapshot.model_validate(snapshot.json()).model_dump(mode="json") == snapshot.json()
+
+    small = client.get("/portfolio/metrics", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert {"Accept", "Accept-Encoding"} <= set(small.headers["Vary"].split(", "))
+    not_modified = client.get("/portfolio", headers={"If-None-Match": snapshot.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert {"Accept", "Accept-Encoding"} <= set(not_modified.headers["Vary"].split(", "))
+    assert small.json()["total_assets"] == 50
+
+
+def test_transactions_msgpack_negotiation(client):
+    msgpack = pytest.importorskip("msgpack")
+
+    client.post(
+        "/transactions",
+        json={
+            "asset_id": "PACK1",
+            "operation_type": "BUY",
+            "quantity": 2,
+            "price": 10,
+            "currency": "USD",
+            "trade_date": "2024-01-10",
+        },
+    )
+    resp = client.get("/transactions", headers={"Accept": "application/msgpack"})
+    assert resp.headers["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(resp.content) == client.get("/transactions").json()
+
+
+def test_server_timing_metrics_and_profiler(client, monkeypatch):
+    client.post(
+        "/transactions",
+        json={
+            "asset_id": "TIME1",
+            "operation_type": "BUY",
+            "quantity": 1,
+            "price": 10,
+            "currency": "USD",
+            "trade_date": "2024-01-10",
+        },
+    )
+
+    resp = client.get("/portfolio", params={"engine": "replay"})
+    phases = {metric.split(";")[0]: metric for metric in resp.headers["Server-Timing"].split(", ")}
+    assert {"db", "hydrate", "compute", "serialize", "total"} <= phases.keys()
+    assert "1 rows" in phases["db"]
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["Content-Type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/portfolio",status="200"}' in metrics.text
+    assert 'http_request_phase_duration_seconds_bucket{route="/portfolio",phase="db",le="+Inf"}' in metrics.text
+    client.get("/portfolios/acme/transactions")
+    assert 'route="/portfolios/{portfolio_id}/transactions"' in client.get("/metrics").text
+
+    # Ignored unless profiling is enabled.
+    assert client.get("/portfolio/metrics", headers={"X-Profile": "cumulative"}).json()["total_assets"] == 1
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    profiled = client.get("/transactions", headers={"X-Profile": "tottime"})
+    assert profiled.headers["X-Profiled-Status"] == "200"
+    assert "function calls" in profiled.text
+
+    from app.core import profiling
+
+    # A second request while a profile is running is served normally.
+    with profiling._profiler_lock:
+        skipped = client.get("/portfolio/metrics", headers={"X-Profile": "cumulative"})
+    assert skipped.json()["total_assets"] == 1
+    assert skipped.headers["X-Profile-Skipped"] == "another request is being profiled"
+    assert "X-Profile-Skipped" not in client.get("/transactions", headers={"X-Profile": "tottime"}).headers
+
+
+def test_queue_logging_writes_batches_off_thread():
+    import logging
+    import queue
+
+    from pythonjsonlogger.json import JsonFormatter
+
+    from app.core.logs import DroppingQueueHandler, install_queue_logging
+
+    stream = io.StringIO()
+    logger = logging.getLogger("transactions_service.test_logs")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = install_queue_logging(logger, JsonFormatter("%(levelname)s %(message)s"), queue_size=100, stream=stream)
+    payload = {"asset_id": "LOG1", "trade_date": date(2024, 1, 10)}
+    logger.info("event %s", "published", extra={"payload": payload})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    listener.stop()
+
+    published, failed = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert published["message"] == "event published"
+    assert published["payload"] == {"asset_id": "LOG1", "trade_date": "2024-01-10"}
+    assert failed["levelname"] == "ERROR" and "ValueError: boom" in failed["exc_info"]
+
+    # A full queue drops records instead of blocking, then reports how many.
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for index in range(3):
+        handler.handle(logging.makeLogRecord({"msg": f"record {index}"}))
+    assert handler.dropped == 2
+    handler.queue.get_nowait()
+    handler.handle(logging.makeLogRecord({"msg": "after"}))
+    assert handler.queue.get_nowait().dropped == 2